@@ -5,8 +5,15 @@ from arango import ArangoClient
 import cag.utils.config as graph_config
 from pyArango.connection import Connection
 import time
+import math
 
 from database.EOGraphCreator import EOGraphCreator
+from queries.arango_queries import NORMALIZE_EMBEDDINGS_QUERY, MISSING_EXTENT_GEOMETRY_QUERY
+from queries.ExtentIndex import get_extent_geometry
+
+
+# node collections with text embeddings (embeddings are stored unit-normalized)
+EMBEDDING_COLLECTIONS = ['STACCollection', 'Publication']
 
 
 def get_connection(username:str, password:str, arangoURL:str):
@@ -63,6 +70,10 @@ def init_db(hostURL:str, username:str, password:str, db_name:str, graph_name:str
             doc_list = json.load(file)
             print(f"found {len(doc_list)} documents")
             for doc in doc_list:
+                if collection_name in EMBEDDING_COLLECTIONS:
+                    normalize_embedding(doc)
+                if collection_name == 'STACCollection':
+                    add_extent_geometry(doc)
                 # create document and save it in the collection
                 collection.insert(doc)
 
@@ -92,6 +103,63 @@ def init_db(hostURL:str, username:str, password:str, db_name:str, graph_name:str
     init_graph(hostURL, username, password, db_name, graph_name)
     print("Finsihed creating graph...")
 
+def normalize_embedding(doc:dict):
+    '''
+        Replaces the text embedding of the document with its unit-normalized version (and stores the original norm)
+    '''
+    embedding = doc.get('text_embedding')
+    if not embedding or doc.get('embedding_normalized'):
+        return
+    embedding = [float(x) for x in embedding]
+    norm = math.sqrt(sum(x*x for x in embedding))
+    if norm == 0:
+        return
+    doc['text_embedding'] = [x / norm for x in embedding]
+    doc['text_embedding_norm'] = norm
+    doc['embedding_normalized'] = True
+
+
+def normalize_embeddings(hostURL:str, username:str, password:str, db_name:str):
+    '''
+        Re-index command for databases that were initialized with raw text embeddings
+        Normalizes the stored embeddings of all nodes that are not normalized yet (nothing to do for already normalized nodes)
+    '''
+    client = ArangoClient(hosts=hostURL)
+    db = client.db(db_name, username=username, password=password)
+    for collection_name in EMBEDDING_COLLECTIONS:
+        if not db.has_collection(collection_name):
+            continue
+        print(f"normalizing text embeddings of collection {collection_name}...")
+        db.aql.execute(NORMALIZE_EMBEDDINGS_QUERY, bind_vars={'@collection': collection_name})
+
+
+def add_extent_geometry(doc:dict):
+    '''
+        Stores the GeoJSON footprint of the spatial extent (extent.spatial.bbox) of a STAC collection in extent_geometry (used by the geo index)
+    '''
+    extent = doc.get('extent', {}).get('spatial', {}).get('bbox')
+    doc['extent_geometry'] = get_extent_geometry(extent)
+
+
+def init_spatial_index(hostURL:str, username:str, password:str, db_name:str):
+    '''
+        Re-index command for databases that were initialized without extent geometries
+        Derives extent_geometry for all STAC collections that do not have it yet and makes sure that the geo index exists
+    '''
+    client = ArangoClient(hosts=hostURL)
+    db = client.db(db_name, username=username, password=password)
+    if not db.has_collection('STACCollection'):
+        return
+    collection = db.collection('STACCollection')
+    docs = [doc for doc in db.aql.execute(MISSING_EXTENT_GEOMETRY_QUERY, batch_size=1000)]
+    if docs:
+        print(f"deriving extent geometries of {len(docs)} STAC collections...")
+        for doc in docs:
+            add_extent_geometry(doc)
+        collection.update_many([{'_key': doc['_key'], 'extent_geometry': doc['extent_geometry']} for doc in docs])
+    EOGraphCreator.create_stac_geo_index(db)
+
+
 def init_graph(hostURL:str, username:str, password:str, db_name:str, graph_name:str):
     cag_config = graph_config.Config(
         url=hostURL, 
@@ -112,3 +180,6 @@ def init_graph(hostURL:str, username:str, password:str, db_name:str, graph_name:
     # create search views
     gc.create_search_views()
 
+    # create geo index on STAC collection extents
+    EOGraphCreator.create_stac_geo_index(gc.arango_db)
+
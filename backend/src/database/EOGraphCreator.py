@@ -5,6 +5,7 @@
 
 
 
+from arango.exceptions import IndexCreateError
 from cag.graph_elements.nodes import GenericOOSNode, Field
 from cag.graph_elements.relations import GenericEdge
 from cag.framework.creator.base_creator import GraphCreatorBase
@@ -88,6 +89,7 @@ class STACCollection(GenericOOSNode):
         'links': Field(), 
         'providers': Field(), 
         'assets': Field(), 
+        'extent_geometry': Field(), # GeoJSON footprint of extent (derived at ingest)
         **GenericOOSNode._fields, 
     }
 
@@ -223,6 +225,17 @@ class EOGraphCreator(GraphCreatorBase):
         print(f"Finished creating all views!")
         
 
+    @staticmethod
+    def create_stac_geo_index(arango_db):
+        ''' Creates the geo index on the GeoJSON footprints of the STAC collection extents (existing index is kept) '''
+        try:
+            # python-arango 7.x: ordered is sent as the geoJson flag (coordinates in GeoJSON order: lon, lat)
+            arango_db.collection(STACCollection._name).add_geo_index(fields=['extent_geometry'], ordered=True)
+            print("Successfully created geo index on STAC collection extents!")
+        except IndexCreateError as e:
+            print(e)
+            print("error - could not create geo index on STAC collection extents; spatial STAC search scans all collections")
+
     def create_analyzers(self):
         # from https://gitlab.com/opensearch-dlr/opensearch-flows
         # create view for searching the KG
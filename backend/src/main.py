@@ -1,11 +1,10 @@
-from fastapi import FastAPI, Response
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import yaml
 from pyArango.connection import Connection
 from dotenv import load_dotenv
-import os
-from starlette.background import BackgroundTask
+import json
 
 
 
@@ -14,12 +13,13 @@ import sys
 sys.path.append("src/")
 
 
-from utils import get_stac_collection_from_id
+from utils import get_stac_collection_from_id, stream_zip
 
 from queries.Requests import *
 from queries.QueryAnalyzer import QueryAnalyzer
 from queries.DataRetriever import DataRetriever
-from database.Database import init_db, get_connection
+from queries.ModelRegistry import model_registry, EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_TTL
+from database.Database import init_db, get_connection, normalize_embeddings, init_spatial_index
 
 
 
@@ -32,7 +32,10 @@ with open('src/config.yml', 'r') as file:
 
     web_api_key = config['web_api_key']
     geonames_username = config['geonames_username']
-    web_api = config.get('web_api', 2) # default is Chatnoir (=2)
+    web_api = config.get('web_api', 2) # default is Chatnoir (=2); 4 -> federated search on all web indexes
+    web_timeouts = config.get('web_timeouts', {}) # timeout in seconds per web index source (e.g. {'mosaic': 5})
+    web_deadline = config.get('web_deadline', 8.0) # global deadline in seconds for federated web search
+    web_cache_ttls = config.get('web_cache_ttls', {}) # lifetime in seconds of cached web results per source
 
     arango_username = arango_config.get('username')
     arango_password = arango_config.get('password')
@@ -43,6 +46,30 @@ with open('src/config.yml', 'r') as file:
 
     frontend_url = frontend_config.get('hostURL')
 
+    # approximate nearest neighbour index for semantic publication search (path, nlist, nprobe)
+    pub_index_config = config.get('pub_index', {})
+
+    # persistent geocoding cache of the query analyzer (path, ttl, negative_ttl)
+    geocode_cache_config = config.get('geocode_cache', {})
+
+    # offline location resolution from a gazetteer index built from a GeoNames dump (index_path, remote_fallback)
+    gazetteer_config = config.get('gazetteer', {})
+
+    # spatial filter for STAC collection search: 'memory' (in-memory extent index) or 'arango' (geo index, supports polygons)
+    stac_spatial_backend = config.get('stac_spatial_backend', 'memory')
+
+    # cache for query embeddings of the model registry (size, ttl)
+    embedding_cache_config = config.get('embedding_cache', {})
+
+    # GeoJSON file of the geotweet store (path, time_property, cell_size)
+    geotweets_config = config.get('geotweets', {})
+
+
+# embedding cache is configured before any query is encoded
+model_registry.configure_cache(
+    cache_size=embedding_cache_config.get('size', EMBEDDING_CACHE_SIZE), 
+    cache_ttl=embedding_cache_config.get('ttl', EMBEDDING_CACHE_TTL), 
+)
 
 
 # ESTABLISH ARANGODB CONNECTION
@@ -59,6 +86,18 @@ if db_name not in conn.databases:
     init_db(hostURL=arango_url, username=arango_username, password=arango_password, db_name=db_name, graph_name=graph_name, data_path=data_path)
 else:
     db = conn.databases[db_name]
+    # make sure that stored text embeddings are unit-normalized (only updates nodes that are not normalized yet)
+    try:
+        normalize_embeddings(hostURL=arango_url, username=arango_username, password=arango_password, db_name=db_name)
+    except Exception as e:
+        print(e)
+        print(f"error - could not normalize text embeddings")
+    # make sure that STAC collections have extent geometries + geo index (only updates collections without geometry)
+    try:
+        init_spatial_index(hostURL=arango_url, username=arango_username, password=arango_password, db_name=db_name)
+    except Exception as e:
+        print(e)
+        print(f"error - could not create spatial index on STAC collection extents")
 
 # CREATE BACKEND API 
 app = FastAPI()
@@ -81,10 +120,19 @@ app.add_middleware(
 
 
 # create QueryAnalyzer object
-qa = QueryAnalyzer(geonames_username='johndolier')
+qa = QueryAnalyzer(geonames_username='johndolier', geocode_cache_config=geocode_cache_config, gazetteer_config=gazetteer_config)
 
 # create DataRetriever object
-data_retriever = DataRetriever(web_api_key=web_api_key, db_instance=db, graph_name=graph_name, web_api=web_api)
+data_retriever = DataRetriever(web_api_key=web_api_key, db_instance=db, graph_name=graph_name, web_api=web_api, pub_index_config=pub_index_config, web_timeouts=web_timeouts, web_deadline=web_deadline, web_cache_ttls=web_cache_ttls, stac_spatial_backend=stac_spatial_backend, geotweets_config=geotweets_config)
+
+# load and warm up embedding models once per process (shared by all retrieval paths)
+model_registry.warm_up()
+
+@app.on_event("shutdown")
+async def shutdown():
+    # close pooled connections to the external web indexes
+    await data_retriever.web_client.aclose()
+    data_retriever.pc_signer.stop()
 
 # DEFINE ENDPOINTS
 
@@ -94,7 +142,9 @@ def pub_request(request: PubRequest) -> tuple[str, list[dict]]:
         results = data_retriever.make_publications_query(
             query=request.query, 
             keywords=request.keywords, 
-            #limit=request.limit, 
+            limit=request.limit, 
+            offset=request.offset, 
+            semantic=request.semantic, 
         )
     except Exception as e:
         print(e)
@@ -110,7 +160,8 @@ def stac_collection_request(request: STACCollectionRequest) -> tuple[str, list[d
             query=request.query, 
             keywords=request.keywords, 
             location_filter=request.location_filter, 
-            #limit=request.limit, 
+            limit=request.limit, 
+            offset=request.offset, 
         )
     except Exception as e:
         print(e)
@@ -120,9 +171,9 @@ def stac_collection_request(request: STACCollectionRequest) -> tuple[str, list[d
     return ('stac_collections', results)
 
 @app.post("/webRequest")
-def web_request(request: WebRequest) -> tuple[str, list[dict]]:
+async def web_request(request: WebRequest) -> tuple[str, list[dict]]:
     try:
-        results = data_retriever.make_web_query(query=request.query, 
+        results = await data_retriever.make_web_query(query=request.query, 
             limit=request.limit, 
             location_filter=request.location_filter, 
             verbose=True
@@ -135,37 +186,16 @@ def web_request(request: WebRequest) -> tuple[str, list[dict]]:
     return ('web_documents', results)
 
 @app.get("/keywordRequest")
-def get_all_keywords_request():
-    try:
-        keywords = data_retriever.get_all_keywords()
-    except Exception as e:
-        print(e)
-        print(f"error - get_all_keywords failed")
-        keywords = []
-    
-    return keywords
+def get_all_keywords_request(request: Request):
+    return get_snapshot_response(data_retriever.keyword_snapshot, request)
 
 @app.get("/authorRequest")
-def get_all_authors_request():
-    try:
-        authors = data_retriever.get_all_authors()
-    except Exception as e:
-        print(e)
-        print(f"error - get_all_authors failed")
-        authors = []
-    
-    return authors
+def get_all_authors_request(request: Request):
+    return get_snapshot_response(data_retriever.author_snapshot, request)
 
 @app.get("/eoNodeRequest")
-def get_all_eo_nodes_request():
-    try:
-        eo_nodes = data_retriever.get_all_eo_nodes()
-    except Exception as e:
-        print(e)
-        print(f"error - get_all_eo_nodes failed")
-        eo_nodes = []
-    
-    return eo_nodes
+def get_all_eo_nodes_request(request: Request):
+    return get_snapshot_response(data_retriever.eo_node_snapshot, request)
 
 @app.post("/graphQueryRequest")
 def graph_query_request(request: GraphQueryRequest):
@@ -217,6 +247,7 @@ def make_stac_item_request(request: STACItemRequest, response: Response) -> tupl
             location_filter=request.location_filter, 
             time_interval=request.time_interval, 
             limit=request.limit, 
+            compact=request.compact, 
         )
     except Exception as e:
         print(e)
@@ -225,6 +256,87 @@ def make_stac_item_request(request: STACItemRequest, response: Response) -> tupl
     
     return ('stac_items', stac_items)
 
+@app.post("/stacItemDetailRequest", status_code=200)
+def make_stac_item_detail_request(request: STACItemDetailRequest, response: Response) -> tuple[str, dict | None]:
+    '''
+        Returns the full STAC item (all assets, links and properties) for an item that was requested in compact mode
+    '''
+    stac_collection_id = get_stac_collection_from_id(request.collection_id)
+    if stac_collection_id is None:
+        response.status_code = 400
+        return ('stac_item', None)
+
+    try:
+        stac_item = data_retriever.make_stac_item_detail_query(
+            stac_collection_id=stac_collection_id, 
+            stac_item_id=request.item_id, 
+        )
+    except Exception as e:
+        print(e)
+        print(f"error - make_stac_item_detail_query failed for request: {request}")
+        response.status_code = 500
+        return ('stac_item', None)
+
+    if stac_item is None:
+        response.status_code = 404
+    return ('stac_item', stac_item)
+
+@app.post("/stacItemBatchRequest", status_code=200)
+async def make_stac_item_batch_request(request: STACItemBatchRequest) -> tuple[str, dict]:
+    '''
+        Makes STAC requests for many collections at once (given location and time constraints)
+        Returns the items and the status per requested collection
+    '''
+    stac_collection_ids = {get_stac_collection_from_id(collection_id): collection_id for collection_id in request.collection_ids}
+    try:
+        results = await data_retriever.make_stac_item_batch_query(
+            stac_collection_ids=list(stac_collection_ids.keys()), 
+            location_filter=request.location_filter, 
+            time_interval=request.time_interval, 
+            limit=request.limit, 
+            compact=request.compact, 
+        )
+        # use the collection ID's of the request as keys
+        results = {stac_collection_ids[stac_collection_id]: result for stac_collection_id, result in results.items()}
+    except Exception as e:
+        print(e)
+        print(f"error - make_stac_item_batch_query failed for request: {request}")
+        results = {collection_id: {'status': 'error', 'items': []} for collection_id in request.collection_ids}
+
+    return ('stac_items_batch', results)
+
+@app.post("/stacItemStreamRequest", status_code=200)
+async def stream_stac_item_request(request: STACItemRequest, http_request: Request, response: Response):
+    '''
+        Streaming variant of /stacItemRequest: returns the STAC items as NDJSON (one item per line), page by page as they arrive
+    '''
+    stac_collection_id = get_stac_collection_from_id(request.collection_id)
+    if stac_collection_id is None:
+        response.status_code = 400
+        return None
+
+    async def item_stream():
+        pages = data_retriever.stream_stac_item_pages(
+            stac_collection_id=stac_collection_id, 
+            location_filter=request.location_filter, 
+            time_interval=request.time_interval, 
+            limit=request.limit, 
+            compact=request.compact, 
+        )
+        try:
+            async for items in pages:
+                yield ''.join(json.dumps(item) + '\n' for item in items)
+                if await http_request.is_disconnected():
+                    print(f"client disconnected - stopping STAC item stream for {stac_collection_id}")
+                    break
+        except Exception as e:
+            print(e)
+            print(f"error - stream_stac_item_pages failed for request: {request}")
+        finally:
+            await pages.aclose()
+
+    return StreamingResponse(item_stream(), media_type="application/x-ndjson")
+
 @app.post("/notebookExportRequest", status_code=200)
 def create_notebook_export(request: NotebookExportRequest, response: Response):
     ''' 
@@ -236,7 +348,7 @@ def create_notebook_export(request: NotebookExportRequest, response: Response):
         return None
     
     try:
-        filepath = data_retriever.create_notebook_export(
+        notebook = data_retriever.create_notebook_export(
             stac_collection_id=stac_collection_id, 
             location_filter=request.location_filter, 
             time_interval=request.time_interval, 
@@ -244,13 +356,36 @@ def create_notebook_export(request: NotebookExportRequest, response: Response):
     except Exception as e:
         print(e)
         print(f"error - create_notebook_export failed for request {request}")
-        filepath = None
+        notebook = None
     
-    if filepath is None:
+    if notebook is None:
         print(f"something went wrong.. could not create python notebook for STAC download...")
         return None
 
-    return FileResponse(filepath, media_type="ipynb", background=BackgroundTask(cleanup, filepath))
+    # notebook is rendered in memory -> no temporary file (concurrent exports do not overwrite each other)
+    headers = {'Content-Disposition': f'attachment; filename="{stac_collection_id}.ipynb"'}
+    return Response(content=notebook, media_type="ipynb", headers=headers)
+
+@app.post("/notebookBulkExportRequest", status_code=200)
+def create_notebook_bulk_export(request: NotebookBulkExportRequest, response: Response):
+    '''
+        Creates jupyter notebooks for many exports at once; returns them as zip archive that is built while streaming
+    '''
+    if not request.exports:
+        response.status_code = 400
+        return None
+
+    exports = [
+        {
+            'stac_collection_id': get_stac_collection_from_id(export.collection_id), 
+            'location_filter': export.location_filter, 
+            'time_interval': export.time_interval, 
+        }
+        for export in request.exports
+    ]
+    notebooks = data_retriever.create_notebook_exports(exports)
+    headers = {'Content-Disposition': 'attachment; filename="notebooks.zip"'}
+    return StreamingResponse(stream_zip(notebooks), media_type="application/zip", headers=headers)
 
 
 @app.post("/geotweetRequest")
@@ -262,6 +397,9 @@ def get_all_geotweets(request: GeotweetRequest):
         geotweets = data_retriever.get_geotweets(
             only_floods=request.only_floods, 
             limit = request.limit, 
+            offset=request.offset, 
+            location_filter=request.location_filter, 
+            time_interval=request.time_interval, 
         )
     except Exception as e:
         print(e)
@@ -271,9 +409,47 @@ def get_all_geotweets(request: GeotweetRequest):
     return geotweets
 
 
+@app.get("/metricsRequest")
+def get_metrics_request() -> dict:
+    '''
+        Returns performance metrics of the backend (model load times, encode latencies, cache hit rates)
+    '''
+    return {
+        'models': model_registry.get_stats(),
+        'embedding_cache': model_registry.embedding_cache.get_stats(),
+        'web_cache': data_retriever.web_client.cache.get_stats(),
+        'stac_item_cache': data_retriever.stac_item_cache.get_stats(),
+        'pc_sas_tokens': data_retriever.pc_signer.get_stats(),
+        'geocode_cache': qa.geocode_cache.get_stats(),
+        'gazetteer': qa.gazetteer.get_stats() if qa.gazetteer is not None else None,
+    }
+
 
 ########################################
 # HELPER FUNCTIONS
-def cleanup(filepath):
-    # remove file after sending response to client
-    os.remove(filepath)
+def get_snapshot_response(snapshot, request: Request) -> Response:
+    '''
+        Serves a vocabulary snapshot (pre-serialized JSON)
+        Answers with 304 if the client already has the current version (If-None-Match) and with the pre-compressed body if the client accepts gzip
+    '''
+    try:
+        etag, body, gzip_body = snapshot.get()
+    except Exception as e:
+        print(e)
+        print(f"error - could not load {snapshot.name} snapshot")
+        return Response(content=b'[]', media_type="application/json")
+
+    headers = {
+        'Cache-Control': 'no-cache', # clients always revalidate with ETag
+        'Vary': 'Accept-Encoding', 
+    }
+    if etag is not None:
+        headers['ETag'] = etag
+        if etag in request.headers.get('if-none-match', ''):
+            return Response(status_code=304, headers=headers)
+
+    if 'gzip' in request.headers.get('accept-encoding', ''):
+        headers['Content-Encoding'] = 'gzip'
+        body = gzip_body
+    return Response(content=body, media_type="application/json", headers=headers)
+
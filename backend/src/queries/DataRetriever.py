@@ -1,36 +1,71 @@
-import requests
 import json
 import pystac_client
+from pystac_client.conformance import ConformanceClasses
 import geojson
-import planetary_computer
 from pyArango.connection import DBHandle
-from sentence_transformers import SentenceTransformer
 import nbformat as nbf
-import uuid
+import os
+import copy
+import threading
+import time
+import asyncio
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 
 
-from utils import normalize_scoring_range
 from queries.arango_queries import *
+from queries.ModelRegistry import model_registry
+from queries.VectorIndex import build_vector_index, collect_embeddings, IVFIndex
+from queries.VocabularySnapshot import VocabularySnapshot
+from queries.WebSearchClient import WebSearchClient
+from queries.STACItemCache import STACItemCache, TILE_INCOMPLETE, TILE_MISSING
+from queries.LonLatGrid import get_bbox_from_geometry
+from queries.PCSigner import PCSigner
+from queries.GeotweetStore import GeotweetStore, GRID_CELL_SIZE
+from queries.ExtentIndex import ExtentIndex, orient_polygon
+from queries.LocationGeometry import LocationGeometry
 
 
-CHATNOIR_ENDPOINT = 'https://chatnoir.web.webis.de/api/v1/_search'
-PROTOTYPE_WEBINDEX_ENDPOINT = 'https://qnode.eu/ows/prosa/service/'
-MOSAIC_ENDPOINT = 'https://qnode.eu/ows/mosaic/service/'
-
-DEMO_INDEX_MOSAIC = "dlrprototype"
-DEMO_INDEX_STANDARD = "demo-dlrsciencesearch"
-
 PC_API = "https://planetarycomputer.microsoft.com/api/stac/v1"
 TERRABYTE_API = "https://stac.terrabyte.lrz.de/public/api"
 GEOSERVICE_API = "https://geoservice.dlr.de/eoc/ogc/stac/v1"
 
+# catalog clients are reopened after this interval (seconds) to pick up changes of the landing page/conformance classes
+CATALOG_REFRESH_INTERVAL = 3600
+
+# minimum interval (seconds) between two checks whether the STAC sources changed in ArangoDB
+STAC_SOURCE_CHECK_INTERVAL = 30
+
+# page size for streaming STAC item search
+STAC_ITEM_PAGE_SIZE = 50
+
+# maximum number of concurrent upstream item searches per STAC source (direct searches and tile fetches of all requests)
+STAC_SOURCE_CONCURRENCY = 4
+
+# template for the notebook export; NOTEBOOK_PARSE_BLOCK_IDX is the code block that has to be filled in with custom values
+NOTEBOOK_TEMPLATE_PATH = 'assets/STAC_notebook_template.ipynb'
+NOTEBOOK_PARSE_BLOCK_IDX = 5
+
+# spatial filter backends for STAC collection search: in-memory extent index ('memory') or geo index in ArangoDB ('arango')
+STAC_SPATIAL_BACKENDS = ['memory', 'arango']
+
+# default GeoJSON file of the geotweet store (can be set in the config)
+GEOTWEETS_PATH = "src/database/geotweets/geotweets_sample.geojson"
+
+# fields of compact STAC items (requested via fields extension if the STAC API supports it)
+STAC_ITEM_COMPACT_FIELDS = ['type', 'id', 'collection', 'geometry', 'bbox', 'properties.datetime', 'assets.rendered_preview', 'assets.thumbnail']
+
 
 
 class DataRetriever:
-    def __init__(self, web_api_key:str, db_instance:DBHandle, graph_name:str, web_api:int) -> None:
+    def __init__(self, web_api_key:str, db_instance:DBHandle, graph_name:str, web_api:int, pub_index_config:dict = None, web_timeouts:dict = None, 
+                 web_deadline:float = 8.0, web_cache_ttls:dict = None, stac_spatial_backend:str = 'memory', geotweets_config:dict = None) -> None:
         self.api_key = web_api_key
         self.db = db_instance
         self.graph_name = graph_name
+        self.web_deadline = web_deadline # global deadline (seconds) for federated web search
+        # async client for the external web indexes (pooled connections, per-source timeouts, result cache)
+        self.web_client = WebSearchClient(web_api_key=web_api_key, timeouts=web_timeouts, cache_ttls=web_cache_ttls)
         
         if web_api == 1:
             # chatnoir
@@ -43,108 +78,354 @@ class DataRetriever:
         elif web_api == 3:
             print("DataRetriever - using Mosaic open web index")
             self.index_source = "mosaic"
+        elif web_api == 4:
+            # query all web indexes concurrently
+            print("DataRetriever - using federated search on all web indexes")
+            self.index_source = "federated"
         else:
             # default
             print("Error - invalid web api source!")
             print("Using chatnoir web index")
             self.index_source = "chatnoir"
         
-        # fetch STAC source information
-        self.stac_source_dict = self.__fetch_stac_source_information()
+        # fetch STAC source information + map of STAC collection key -> STAC source key
+        self.stac_source_dict = {}
+        self.collection_source_map = {}
+        self.stac_source_version = None
+        self.stac_source_last_check = None
+        self.refresh_stac_sources()
+
+        # one long-lived catalog client per STAC API (api_link -> (opened_at, catalog))
+        # every client keeps its own pooled http session, so item requests only pay for the search itself
+        self.catalogs = {}
+        self.catalog_lock = threading.Lock()
+        # signs Planetary Computer assets with cached SAS tokens (refreshed in the background)
+        self.pc_signer = PCSigner()
+        self.pc_signer.start()
+
+        # tile cache for STAC items (map panning/zooming requests overlapping areas)
+        self.stac_item_cache = STACItemCache()
+        # limits concurrent collection queries of batch requests per STAC source (created lazily inside the event loop)
+        self.stac_source_semaphores = {}
+        # limits concurrent upstream item searches per STAC source (shared by direct searches and tile fetches)
+        self.stac_source_limits = {}
+        self.stac_source_limits_lock = threading.Lock()
+
+        # notebook template is parsed once; every export renders a copy in memory
+        try:
+            self.notebook_template = nbf.read(NOTEBOOK_TEMPLATE_PATH, as_version=4)
+        except Exception as e:
+            print(e)
+            print(f"error - could not load notebook template {NOTEBOOK_TEMPLATE_PATH}")
+            self.notebook_template = None
+
+        # columnar geotweet store with grid index (loaded on first request)
+        geotweets_config = geotweets_config or {}
+        self.geotweet_store = GeotweetStore(
+            path=geotweets_config.get('path', GEOTWEETS_PATH), 
+            time_property=geotweets_config.get('time_property', 'created_at'), 
+            cell_size=geotweets_config.get('cell_size', GRID_CELL_SIZE), 
+        )
+
+        # in-memory snapshots of the vocabularies that are requested on every page load of the frontend
+        self.keyword_snapshot = VocabularySnapshot('keyword', db_instance, ['Keyword'], self.get_all_keywords)
+        self.author_snapshot = VocabularySnapshot('author', db_instance, ['Author'], self.get_all_authors)
+        self.eo_node_snapshot = VocabularySnapshot('eo_node', db_instance, ['EOMission', 'EOInstrument'], self.get_all_eo_nodes)
+        for snapshot in [self.keyword_snapshot, self.author_snapshot, self.eo_node_snapshot]:
+            snapshot.refresh()
+
+        if stac_spatial_backend not in STAC_SPATIAL_BACKENDS:
+            print(f"Error - invalid STAC spatial backend {stac_spatial_backend}! Using in-memory extent index")
+            stac_spatial_backend = 'memory'
+        print(f"DataRetriever - using {stac_spatial_backend} spatial backend for STAC collection search")
+        self.stac_spatial_backend = stac_spatial_backend
 
+        # build in-memory vector index for STAC collection embeddings + grid index over their spatial extents (same row order)
+        self.stac_index = None
+        self.stac_extent_index = None
+        self.stac_index_revision = None
+        self.stac_index_last_check = None
+        self.stac_index_lock = threading.Lock()
+        self.refresh_stac_index(force=True)
 
-    def make_web_query(self, query:str, limit:int, location_filter:dict, verbose:bool=False):
+        # approximate nearest neighbour index for Publication embeddings is loaded (or built) in the background
+        # semantic publication search is available as soon as the index is ready
+        pub_index_config = pub_index_config or {}
+        self.pub_index_path = pub_index_config.get('path', 'assets/pub_index.npz')
+        self.pub_index_nlist = pub_index_config.get('nlist', 256)
+        self.pub_index_nprobe = pub_index_config.get('nprobe', 8)
+        self.pub_index = None
+        threading.Thread(target=self.refresh_pub_index, daemon=True).start()
+
+    def refresh_stac_sources(self, force:bool = False):
+        '''
+            Loads the STAC source information and the collection -> source map (built from STACSourceContains edges)
+            Only reloads if the STACSource/STACSourceContains collections changed (checked at most every STAC_SOURCE_CHECK_INTERVAL seconds)
+        '''
+        if not force and self.stac_source_last_check is not None and time.monotonic() - self.stac_source_last_check < STAC_SOURCE_CHECK_INTERVAL:
+            return
+        self.stac_source_last_check = time.monotonic()
+        try:
+            version = (self.db["STACSource"].revision(), self.db["STACSourceContains"].revision())
+            if not force and version == self.stac_source_version:
+                return
+            self.stac_source_dict = self.__fetch_stac_source_information()
+            collection_source_map = {}
+            result = self.db.AQLQuery(STAC_COLLECTION_SOURCE_MAP_QUERY, batchSize=1000, rawResults=True)
+            for edge in result:
+                collection_source_map[edge['collection']] = edge['source']
+            self.collection_source_map = collection_source_map
+            if self.stac_source_version is not None:
+                # STAC sources changed (e.g. new API link) -> catalog clients are reopened on the next item request
+                self.refresh_catalogs()
+            self.stac_source_version = version
+            print(f"DataRetriever - loaded {len(self.stac_source_dict)} STAC sources with {len(collection_source_map)} collections")
+        except Exception as e:
+            print(e)
+            print("error - could not load STAC source information")
+
+    def refresh_stac_index(self, force:bool = False):
+        '''
+            (Re)builds the in-memory vector index over all STACCollection text embeddings and the grid index over their spatial extents
+            Only rebuilds if the STACCollection collection changed (checked at most every STAC_SOURCE_CHECK_INTERVAL seconds)
+            If the rebuild fails, the previous indexes are kept (semantic STAC search falls back to the slow ArangoDB query if there is none)
+        '''
+        if not force and self.stac_index_last_check is not None and time.monotonic() - self.stac_index_last_check < STAC_SOURCE_CHECK_INTERVAL:
+            return
+        # only one thread checks/rebuilds; concurrent requests use the current indexes in the meantime
+        if not self.stac_index_lock.acquire(blocking=force):
+            return
+        try:
+            if not force and self.stac_index_last_check is not None and time.monotonic() - self.stac_index_last_check < STAC_SOURCE_CHECK_INTERVAL:
+                # another thread checked in the meantime
+                return
+            self.stac_index_last_check = time.monotonic()
+            revision = self.db["STACCollection"].revision()
+            if not force and revision == self.stac_index_revision:
+                return
+            nodes = [node for node in self.db.AQLQuery(STAC_EMBEDDINGS_QUERY, batchSize=1000, rawResults=True)]
+            stac_index = build_vector_index(nodes)
+            extents = {node['id']: node.get('extent') for node in nodes}
+            stac_extent_index = ExtentIndex([extents.get(node_id) for node_id in stac_index.ids])
+            # both indexes are replaced together (row order must match)
+            self.stac_index, self.stac_extent_index = stac_index, stac_extent_index
+            # revision is only updated after a successful rebuild (failed rebuilds are retried on the next check)
+            self.stac_index_revision = revision
+            print(f"DataRetriever - built STAC vector and extent index with {len(self.stac_index)} collections")
+        except Exception as e:
+            print(e)
+            print("error - could not build STAC vector index; keeping previous index")
+        finally:
+            self.stac_index_lock.release()
+
+    def refresh_pub_index(self, rebuild:bool = False):
+        '''
+            Loads the approximate nearest neighbour index for Publication embeddings from disk
+            The index is (re)built from ArangoDB and persisted if it does not exist, is outdated or rebuild is set
+        '''
+        try:
+            revision = self.db["Publication"].revision()
+            if not rebuild and os.path.isfile(self.pub_index_path):
+                pub_index = IVFIndex.load(self.pub_index_path, nprobe=self.pub_index_nprobe)
+                if pub_index.revision == revision:
+                    self.pub_index = pub_index
+                    print(f"DataRetriever - loaded publication index with {len(pub_index)} publications")
+                    return
+                print("DataRetriever - publication index is outdated")
+
+            print("DataRetriever - building publication index...")
+            result = self.db.AQLQuery(PUB_EMBEDDINGS_QUERY, batchSize=1000, rawResults=True)
+            ids, embeddings = collect_embeddings(result)
+            if not ids:
+                print("warning - no publication embeddings found; semantic publication search is disabled")
+                return
+            pub_index = IVFIndex.build(ids, embeddings, nlist=self.pub_index_nlist, nprobe=self.pub_index_nprobe, revision=revision)
+            pub_index.save(self.pub_index_path)
+            self.pub_index = pub_index
+            print(f"DataRetriever - built publication index with {len(pub_index)} publications")
+        except Exception as e:
+            print(e)
+            print("error - could not load publication index")
+
+
+    async def make_web_query(self, query:str, limit:int, location_filter:dict, verbose:bool=False):
         '''
             Makes web query on selected source (chatnoir or prototype webindex application -> OWS)
             Mosaic request also takes location filter
+            In federated mode, all sources are queried concurrently and the merged results are returned
         '''
-        if self.index_source == "chatnoir":
-            results = self.__make_web_query_chatnoir(query=query, limit=limit, verbose=verbose)
-        elif self.index_source == "prototype_webindex":
-            results = self.__make_web_query_prototype_webindex(query=query, limit=limit, verbose=verbose)
-        elif self.index_source == "mosaic":
-            results = self.__make_web_query_mosaic_webindex(query=query, limit=limit, location_filter=location_filter, verbose=verbose)
-        else:
-            print(f"error - invalid state! did not find web index source for {self.index_source}")
-            results = None
-        return results
+        bbox = self.__get_bbox_from_location_filters(location_filter=location_filter)
+        if self.index_source == "federated":
+            return await self.web_client.federated_search(query=query, limit=limit, bbox=bbox, deadline=self.web_deadline, verbose=verbose)
+        return await self.web_client.search(self.index_source, query=query, limit=limit, bbox=bbox, verbose=verbose)
     
-    def make_stac_item_query(self, stac_collection_id:str, location_filter:list[dict], time_interval:list, limit:int = 100) -> list[dict]:
+    def make_stac_item_query(self, stac_collection_id:str, location_filter:list[dict], time_interval:list, limit:int = 100, 
+                             compact:bool = False) -> list[dict]:
+        '''
+            Requests the STAC items of the collection (given location and time constraints)
+            compact: only returns the fields needed by the map (type, id, collection, geometry, bbox, datetime, img_link)
+        '''
         # TODO find better request strategy for STAC items? 
+        location_geometry = self.__get_location_geometry(location_filter)
+        if location_geometry is not None:
+            tiles = self.stac_item_cache.get_tiles(location_geometry.bbox)
+            if tiles:
+                items = self.__make_tiled_stac_item_query(stac_collection_id, location_geometry, tiles, time_interval, limit, compact)
+                if items is not None:
+                    return items
+
+        # no location filter, area too large for tile cache or tiles are incomplete -> request items directly
+        stac_source, search = self.__create_stac_item_search(stac_collection_id, location_filter, time_interval, limit, compact=compact)
+        return self.__get_stac_items_from_search(search, stac_source, compact)
+
+    def make_stac_item_detail_query(self, stac_collection_id:str, stac_item_id:str) -> dict:
+        '''
+            Requests the full STAC item (all assets, links and properties), e.g. after a compact item was selected on the map
+            Returns None if the item does not exist
+        '''
         stac_source = self.__get_stac_source(stac_collection_id=stac_collection_id)
         api_link = self.stac_source_dict[stac_source]['api_link']
-        catalog = self.__get_catalog(api_link)
-        
-        location_filter = self.__get_geojson_from_location_filters(location_filter)
-        time_interval = self.__get_time_interval(time_interval)
-        
+        catalog = self.__get_cached_catalog(api_link)
         search = catalog.search(
-            max_items = limit, 
+            max_items = 1, 
+            ids = [stac_item_id], 
             collections = stac_collection_id, 
-            intersects = location_filter, 
-            datetime = time_interval, 
         )
-        
-        # found items in planetary computer
-        items_list = []
         for item in search.items():
-            item_dict = item.to_dict()
-            try:
-                # catalogs have different paths to access preview img -> temporary solution: hardcoded paths
-                if stac_source == 'planetary_computer_collections':
-                    item_dict['img_link'] = item_dict.get('assets', {}).get('rendered_preview', {}).get('href')
-                elif stac_source == 'geoservice_collections':
-                    item_dict['img_link'] = item_dict.get('assets', {}).get('thumbnail', {}).get('href')
-                else:
-                    # image not available for terrabyte stac items
-                    item_dict['img_link'] = None            
-            except Exception as e:
-                print(e)
-                print("failed to load rendered preview (planetary computer)")
-                item_dict['img_link'] = None
-            items_list.append(item_dict)
-        return items_list
+            return self.__transform_stac_item(item.to_dict(), stac_source)
+        return None
+
+    async def make_stac_item_batch_query(self, stac_collection_ids:list[str], location_filter:list[dict], time_interval:list, limit:int = 100, 
+                                         compact:bool = False) -> dict:
+        '''
+            Makes the STAC item query for many collections at once
+            Collections are grouped by STAC source; searches run concurrently (limited per source)
+            Returns a dictionary stac_collection_id -> {status, items}
+        '''
+        async def query_collection(stac_collection_id:str, stac_source:str):
+            semaphore = self.stac_source_semaphores.setdefault(stac_source, asyncio.Semaphore(STAC_SOURCE_CONCURRENCY))
+            async with semaphore:
+                try:
+                    items = await asyncio.to_thread(self.make_stac_item_query, stac_collection_id, location_filter, time_interval, limit, compact)
+                    return {'status': 'ok', 'items': items}
+                except Exception as e:
+                    print(e)
+                    print(f"error - make_stac_item_query failed for collection {stac_collection_id}")
+                    return {'status': 'error', 'items': []}
+
+        # resolve all sources at once (might need ArangoDB round-trips -> not in event loop)
+        stac_sources = await asyncio.to_thread(self.__get_stac_sources, stac_collection_ids)
+        results = {}
+        tasks = {}
+        for stac_collection_id, stac_source in stac_sources.items():
+            if stac_source not in self.stac_source_dict:
+                print(f"error - could not find STAC source for collection {stac_collection_id}")
+                results[stac_collection_id] = {'status': 'unknown_collection', 'items': []}
+                continue
+            tasks[stac_collection_id] = query_collection(stac_collection_id, stac_source)
+
+        for stac_collection_id, result in zip(tasks.keys(), await asyncio.gather(*tasks.values())):
+            results[stac_collection_id] = result
+        return results
+
+    async def stream_stac_item_pages(self, stac_collection_id:str, location_filter:list[dict], time_interval:list, limit:int = 100, 
+                                     page_size:int = STAC_ITEM_PAGE_SIZE, compact:bool = False):
+        '''
+            Async generator that yields the STAC items page by page (list of item dictionaries per page)
+            The next page is already fetched while the current page is sent to the client
+            Upstream paging stops as soon as the consumer stops iterating (e.g. client disconnected)
+        '''
+        stac_source, search = await asyncio.to_thread(
+            self.__create_stac_item_search, stac_collection_id, location_filter, time_interval, limit, min(limit, page_size), compact
+        )
+        pages = search.pages_as_dicts()
+        next_page = asyncio.ensure_future(asyncio.to_thread(next, pages, None))
+        try:
+            while True:
+                page = await next_page
+                if page is None:
+                    break
+                # prefetch next page
+                next_page = asyncio.ensure_future(asyncio.to_thread(next, pages, None))
+                items = [self.__transform_stac_item(item_dict, stac_source) for item_dict in page.get('features', [])]
+                if compact:
+                    items = [self.__project_stac_item(item_dict) for item_dict in items]
+                yield items
+        finally:
+            # running page request can not be interrupted, but no further pages are requested
+            next_page.cancel()
 
     def create_notebook_export(self, stac_collection_id:str, location_filter:list[dict], time_interval:list) -> str:
         ''' 
-            This function parses the arguments and generates a Python notebook from a template file ('assets/STAC_notebook_template.ipynb')
+            This function parses the arguments and generates a Python notebook from the template file (NOTEBOOK_TEMPLATE_PATH)
             Placeholders get replaced by the specified arguments (STAC collection ID, location coordinates, time interval...)
+            Returns the notebook as JSON string (rendered in memory, no file is written)
         '''
+        if self.notebook_template is None:
+            print("error - notebook template is not loaded")
+            return None
         
         stac_source = self.__get_stac_source(stac_collection_id=stac_collection_id)
         api_link = self.stac_source_dict[stac_source]['api_link']
+        return self.__render_notebook(stac_collection_id, api_link, location_filter, time_interval)
+
+    def create_notebook_exports(self, exports:list[dict]):
+        '''
+            Generates the notebooks for many exports at once (list of {stac_collection_id, location_filter, time_interval})
+            The STAC sources of all collections are resolved in one batch
+            Returns a generator of (filename, notebook) tuples; notebooks are rendered lazily (one at a time)
+        '''
+        if self.notebook_template is None:
+            print("error - notebook template is not loaded")
+            return
         
+        stac_sources = self.__get_stac_sources(list({export['stac_collection_id'] for export in exports}))
+        for idx, export in enumerate(exports):
+            stac_collection_id = export['stac_collection_id']
+            stac_source = stac_sources.get(stac_collection_id)
+            if stac_source not in self.stac_source_dict:
+                print(f"error - could not find STAC source for collection {stac_collection_id}; skipping notebook export")
+                continue
+            api_link = self.stac_source_dict[stac_source]['api_link']
+            try:
+                notebook = self.__render_notebook(stac_collection_id, api_link, export['location_filter'], export['time_interval'])
+            except Exception as e:
+                print(e)
+                print(f"error - could not create notebook export for collection {stac_collection_id}")
+                continue
+            # index prefix keeps filenames unique (same collection can be exported for different regions)
+            yield f"{idx+1:03d}_{stac_collection_id}.ipynb", notebook
+
+    def __render_notebook(self, stac_collection_id:str, api_link:str, location_filter:list[dict], time_interval:list) -> str:
         # transform location filters (coordinates) and time interval
         coordinates = self.__get_geojson_from_location_filters(location_filter).get('coordinates') # can be None
         time_interval = self.__get_time_interval(time_interval)        
             
-        template_notebook = nbf.read('assets/STAC_notebook_template.ipynb', as_version=4)
-        
-        PARSE_BLOCK_IDX = 5 # this is the code block that has to be filled in with custom values
+        # the preloaded template is shared by all requests -> modify a copy
+        template_notebook = copy.deepcopy(self.notebook_template)
         
-        argument_source_code = template_notebook['cells'][PARSE_BLOCK_IDX]['source']
+        argument_source_code = template_notebook['cells'][NOTEBOOK_PARSE_BLOCK_IDX]['source']
         
         # modify source code
         argument_source_code = argument_source_code.replace('<<api_link>>', str(api_link))
         argument_source_code = argument_source_code.replace('<<coordinates>>', str(coordinates))
         argument_source_code = argument_source_code.replace('<<stac_collection_id>>', str(stac_collection_id))
         
-        template_notebook['cells'][PARSE_BLOCK_IDX]['source'] = argument_source_code
+        template_notebook['cells'][NOTEBOOK_PARSE_BLOCK_IDX]['source'] = argument_source_code
         
-        time_argument_source_code = template_notebook['cells'][PARSE_BLOCK_IDX+1]['source']
+        time_argument_source_code = template_notebook['cells'][NOTEBOOK_PARSE_BLOCK_IDX+1]['source']
         if time_interval is None:
             time_argument_source_code += "\n#No time range arguments provided\ntime_range=None"
         else:
             time_argument_source_code += self.__get_time_interval_source_code(time_interval)
-        template_notebook['cells'][PARSE_BLOCK_IDX+1]['source'] = time_argument_source_code
+        template_notebook['cells'][NOTEBOOK_PARSE_BLOCK_IDX+1]['source'] = time_argument_source_code
         
-        filepath = 'assets/custom_notebook.ipynb'
-        nbf.write(template_notebook, filepath)
-        return filepath
+        return nbf.writes(template_notebook)
         
-    def make_stac_collection_query(self, query:str, keywords:list[str], location_filter:dict, limit:int = 500) -> list[dict]:
+    def make_stac_collection_query(self, query:str, keywords:list[str], location_filter:dict, limit:int = 500, offset:int = 0) -> list[dict]:
         ''' 
             Makes query on arangodb to retrieve stac collections that match the query
+            limit/offset: pagination; only the requested page is loaded from ArangoDB (if the in-memory indexes are available)
         '''
         # TODO automatically get connected eo missions/instruments
 
@@ -154,31 +435,67 @@ class DataRetriever:
             query += f"{word} "
         query = query.strip()
         
+        # parse location filter (polygon is prepared once for all intersection tests)
+        location_geometry = self.__get_location_geometry(location_filter)
+        # geo index in ArangoDB supports polygons as well
+        geometry = None
+        if self.stac_spatial_backend == 'arango':
+            geometry = orient_polygon(self.__get_geojson_from_location_filters(location_filter)) or None
 
-        model = SentenceTransformer('msmarco-distilbert-base-v4')
-        query_embedding = model.encode(query).tolist()
-        query_params = {
-            #'query': keyword_query, 
-            'query_embedding': query_embedding,  
-            #'limit': limit, 
-            'sim_threshold': 0.1, 
-        }
+        query_embedding = model_registry.encode(query, normalize=True)
+        self.refresh_stac_index()
+        stac_index, stac_extent_index = self.stac_index, self.stac_extent_index
+        if stac_index is not None:
+            mask = None
+            if geometry:
+                # spatial filter runs first; only collections with intersecting extent are scored and hydrated
+                mask = self.__get_stac_geo_candidates(stac_index, geometry)
+            if mask is None and location_geometry is not None:
+                mask = stac_extent_index.query(location_geometry.bbox, geometry=location_geometry)
+            # similarity is computed in memory; only the collections of the requested page are loaded from ArangoDB
+            scored_ids = stac_index.search(query_embedding, limit=offset+limit, sim_threshold=0.1, mask=mask)[offset:]
+            query_params = {
+                'scored_ids': [{'id': node_id, 'score': score} for node_id, score in scored_ids], 
+            }
+            aql_query = STAC_HYDRATION_QUERY
+            paginated = True
+        elif geometry:
+            # spatial filter (geo index) runs inside the query before similarity scoring and traversals
+            query_params = {
+                'geometry': geometry, 
+                'query_embedding': query_embedding.tolist(),  
+                'sim_threshold': 0.1, 
+            }
+            aql_query = GEO_STAC_EMB_QUERY
+            paginated = False
+            # spatial filter is already applied in the query
+            location_geometry = None
+        else:
+            query_params = {
+                #'query': keyword_query, 
+                'query_embedding': query_embedding.tolist(),  
+                #'limit': limit, 
+                'sim_threshold': 0.1, 
+            }
+            aql_query = SIMPLE_STAC_EMB_QUERY
+            paginated = False
         try:
-            result = self.db.AQLQuery(SIMPLE_STAC_EMB_QUERY, bindVars=query_params, rawResults=True)
+            result = self.db.AQLQuery(aql_query, bindVars=query_params, rawResults=True)
         except Exception as e:
             print(e)
             result = []
         result = [e for e in result]
         
-        # parse location filter
-        bbox = self.__get_bbox_from_location_filters(location_filter=location_filter)
-        # filter STAC collections by location filter
-        if bbox:
-            result = self.__filter_stac_collections_by_location(result, bbox)
+        # filter STAC collections by location filter (only needed if the in-memory indexes are not available)
+        if location_geometry is not None and not paginated:
+            result = self.__filter_stac_collections_by_location(result, location_geometry)
         else:
             # no location filter passed -> no spatial filtering applied
             pass
 
+        if not paginated:
+            result = result[offset:offset+limit]
+
         # add attributes to stac dictionary (score, eo_objects, loading (flag), stac_items (empty list))
         transformed_results = self.__transform_raw_stac_collection_results(result)
         return transformed_results
@@ -231,25 +548,36 @@ class DataRetriever:
         return eo_nodes_list
     
     
-    def make_publications_query(self, query:str, keywords:list[str] = None, limit:int = 500) -> list[dict]:
+    def make_publications_query(self, query:str, keywords:list[str] = None, limit:int = 500, offset:int = 0, semantic:bool = False) -> list[dict]:
         '''
             Makes query on arangodb to retrieve publications that match the query
+            limit/offset: pagination; authors, keywords and EO objects are only loaded for publications of the requested page
+            semantic: uses text embedding similarity (approximate nearest neighbour index) instead of arangosearch
         '''
-        # alternatively, we can use the keywords to form a query (location and time is evicted from this query)
-        # query = ''
-        # for word in keywords:
-        #     query += f"{word} "
-        # query = query.strip()
-        
-        #model = SentenceTransformer('msmarco-distilbert-base-v4')
-        #query_emb = model.encode(query).tolist()
-        query_params = {
-            'query': query,
-            #'query_embedding': query_emb,  
-            'sim_score': 0.9, 
-        }
+        if semantic and self.pub_index is None:
+            print("warning - publication index is not ready yet; using arangosearch instead")
+            semantic = False
+
+        if semantic:
+            # alternatively, we can use the keywords to form a query (location and time is evicted from this query)
+            if keywords:
+                query = ' '.join(keywords).strip()
+            query_embedding = model_registry.encode(query, normalize=True)
+            scored_ids = self.pub_index.search(query_embedding, limit=offset+limit, sim_threshold=0.1)[offset:]
+            query_params = {
+                'scored_ids': [{'id': node_id, 'score': score} for node_id, score in scored_ids], 
+            }
+            aql_query = PUB_HYDRATION_QUERY
+        else:
+            query_params = {
+                'query': query,
+                'sim_score': 0.9, 
+                'offset': offset, 
+                'limit': limit, 
+            }
+            aql_query = SIMPLE_PUB_ARANGOSEARCH_QUERY
         try:
-            result = self.db.AQLQuery(SIMPLE_PUB_ARANGOSEARCH_QUERY, bindVars=query_params, rawResults=True)
+            result = self.db.AQLQuery(aql_query, bindVars=query_params, rawResults=True)
         except Exception as e:
             print(e)
             result = []
@@ -258,32 +586,20 @@ class DataRetriever:
         transformed_results = self.__transform_raw_publication_results(result)
         return transformed_results
 
-    def get_geotweets(self, only_floods:bool=False, limit:int = 100) -> list[dict]:
+    def get_geotweets(self, only_floods:bool=False, limit:int = 100, offset:int = 0, location_filter:dict = None, time_interval:list = None) -> list[dict]:
         '''
-            Return list of geotweets
+            Return list of geotweets (filtered by location, time and flood flag)
+            Polygon location filters are approximated by their bbox
         '''
-        path = "src/database/geotweets/geotweets_sample.geojson"
-        
-        with open(path, "r") as file:
-            # read geojson file
-            geojson_data = json.load(file)
-
-        tweets = geojson_data.get('features', [])
-        if not only_floods:
-            return tweets[:limit]
-        
-        # filter geotweets
-        filtered_tweets = []
-        for tweet in tweets:
-            try:
-                if not tweet['properties']['contains_flood']:
-                    continue
-                filtered_tweets.append(tweet)
-            except Exception as e:
-                print(e)
-                continue
-        
-        return filtered_tweets[:limit]
+        geometry = self.__get_geojson_from_location_filters(location_filter)
+        bbox = get_bbox_from_geometry(geometry) if geometry else None
+        return self.geotweet_store.query(
+            bbox=bbox, 
+            time_interval=self.__get_time_interval(time_interval), 
+            only_floods=only_floods, 
+            limit=limit, 
+            offset=offset, 
+        )
     
     def make_graph_query(self, keywords_list, authors_list, eo_list):
         ''' Makes graph query for publications and stac collections that are connected to the given keywords, EO Missions/instruments and authors (in case with publications)
@@ -323,159 +639,173 @@ class DataRetriever:
         return {'stac_collections': stac_collections, 'publications': publications}      
         
         
-  # WEB QUERY HELPER FUNCTIONS
-    def __make_web_query_chatnoir(self, query:str, limit:int = 100, verbose:bool = False) -> list[dict]:
-        body = {
-            'apikey': self.api_key, 
-            'query': query, 
-            'index': ['cw12'], # TODO use other indices as well?  
-            'size': limit, 
-            'pretty': True, 
+# STAC QUERY HELPER FUNCTIONS
+    def refresh_catalogs(self):
+        ''' Drops all cached catalog clients; they are reopened on the next item request '''
+        with self.catalog_lock:
+            self.catalogs = {}
+
+    def __get_cached_catalog(self, catalog_url:str):
+        ''' Returns the cached catalog client for the STAC API (opens a new client if there is none or it is outdated) '''
+        entry = self.catalogs.get(catalog_url)
+        if entry is not None and time.monotonic() - entry[0] < CATALOG_REFRESH_INTERVAL:
+            return entry[1]
+        with self.catalog_lock:
+            # check again; another thread could have opened the catalog in the meantime
+            entry = self.catalogs.get(catalog_url)
+            if entry is not None and time.monotonic() - entry[0] < CATALOG_REFRESH_INTERVAL:
+                return entry[1]
+            catalog = self.__get_catalog(catalog_url)
+            self.catalogs[catalog_url] = (time.monotonic(), catalog)
+            print(f"DataRetriever - opened catalog client for {catalog_url}")
+        return catalog
+
+    def __get_catalog(self, catalog_url:str):
+        if "planetarycomputer" in catalog_url:
+            catalog = pystac_client.Client.open(catalog_url, modifier=self.pc_signer.sign)
+        else:
+            catalog = pystac_client.Client.open(catalog_url)
+        return catalog
+
+    def __make_tiled_stac_item_query(self, stac_collection_id:str, location_geometry:LocationGeometry, tiles:list[tuple[int, int, int]], time_interval:list, 
+                                     limit:int, compact:bool = False) -> list[dict]:
+        '''
+            Assembles the STAC items for the location geometry from cached tiles; only missing tiles are fetched upstream
+            Returns None if the result can not be assembled from tiles (a tile is incomplete or more than limit items match);
+            the items have to be requested directly then
+        '''
+        time_interval = self.__get_time_interval(time_interval)
+        items_by_id = {}
+        missing_tiles = []
+        for tile in tiles:
+            status, items = self.stac_item_cache.get(stac_collection_id, tile, time_interval, limit, compact)
+            if status == TILE_INCOMPLETE:
+                return None
+            if status == TILE_MISSING:
+                missing_tiles.append(tile)
+                continue
+            for item in items:
+                items_by_id[item.get('id')] = item
+
+        if missing_tiles:
+            print(f"STAC item cache - fetching {len(missing_tiles)}/{len(tiles)} tiles for collection {stac_collection_id}")
+            with ThreadPoolExecutor(max_workers=len(missing_tiles)) as executor:
+                fetched_tiles = list(executor.map(
+                    lambda tile: self.__fetch_stac_item_tile(stac_collection_id, tile, time_interval, limit, compact), 
+                    missing_tiles
+                ))
+            complete = True
+            for tile, items in zip(missing_tiles, fetched_tiles):
+                if self.stac_item_cache.set(stac_collection_id, tile, time_interval, limit, items, compact) == TILE_INCOMPLETE:
+                    complete = False
+                for item in items:
+                    items_by_id[item.get('id')] = item
+            if not complete:
+                return None
+
+        # tiles cover a larger area than requested -> same intersection test as the STAC API (item geometry)
+        items_list = list(items_by_id.values())
+        mask = location_geometry.intersects_geometries([item.get('geometry') for item in items_list])
+        items_list = [item for item, keep in zip(items_list, mask) if keep]
+        if len(items_list) > limit:
+            # the STAC API decides which items are cut off
+            return None
+        # newest items first (default order of the STAC APIs)
+        items_list.sort(key=lambda item: item.get('properties', {}).get('datetime') or '', reverse=True)
+        return items_list
+
+    def __fetch_stac_item_tile(self, stac_collection_id:str, tile:tuple[int, int, int], time_interval:list, limit:int, compact:bool = False) -> list[dict]:
+        tile_bbox = self.stac_item_cache.get_tile_bbox(tile)
+        # location filter bbox has format: lat/long lat/long; (S,W,N,E)
+        location_filter = {
+            'type': 'bbox', 
+            'coords': [tile_bbox[1], tile_bbox[0], tile_bbox[3], tile_bbox[2]], 
         }
-        response = requests.post(CHATNOIR_ENDPOINT, json.dumps(body))
-        try:
-            if response.status_code > 500 and response.status_code < 600:
-                # SERVER ERROR
-                print(f"Server error (Chatnoir) - status code {response.status_code}")
-                response_dict = {}
-            else:
-                response_dict = json.loads(response.text)
-        except Exception as e:
-            print(f"Exception in parsing response - {e}")
-            print(f"Status code: {response.status_code}")
-            response_dict = {}
+        stac_source, search = self.__create_stac_item_search(stac_collection_id, location_filter, time_interval, limit, compact=compact)
+        return self.__get_stac_items_from_search(search, stac_source, compact)
 
-        meta = response_dict.get('meta', {})
-        results = response_dict.get('results', [])
+    def __get_stac_items_from_search(self, search, stac_source:str, compact:bool = False) -> list[dict]:
+        # the search is executed while iterating the items -> counts against the limit of the STAC source
+        with self.__get_stac_source_limit(stac_source):
+            if not compact:
+                return [self.__transform_stac_item(item.to_dict(), stac_source) for item in search.items()]
+            # projected items are no valid pystac items (missing links, assets...) -> use the raw dictionaries
+            return [self.__project_stac_item(self.__transform_stac_item(item_dict, stac_source)) for item_dict in search.items_as_dicts()]
 
-        if verbose and meta:
-            print(f"query time: {meta.get('query_time')}, total results: {meta.get('total_results')}")
-        
-        # normalize score
-        # TODO find better (safer) way
-        if results:
-            min_score = min([result['score'] for result in results])
-            max_score = max([result['score'] for result in results])
-            results = normalize_scoring_range(results, min_score, max_score)
-
-        # transform results to fit standardized interface
-        transformed_results = []
-        for result in results:
-            title = result.get('title', '')
-            url = result.get('target_uri', '')
-            text = result.get('snippet', '')
-            transformed_results.append({
-                'id': uuid.uuid4(), 
-                'title': title, 
-                'url': url, 
-                'text': text, 
-                'is_html': True,
-                'locations': [], 
-            })
-        return transformed_results
+    def __get_stac_source_limit(self, stac_source:str) -> threading.BoundedSemaphore:
+        with self.stac_source_limits_lock:
+            return self.stac_source_limits.setdefault(stac_source, threading.BoundedSemaphore(STAC_SOURCE_CONCURRENCY))
 
-    def __make_web_query_prototype_webindex(self, query:str, limit:int = 100, verbose:bool = False) -> list[dict]:
-        request_url = f"{PROTOTYPE_WEBINDEX_ENDPOINT}search?q={query}&index={DEMO_INDEX_STANDARD}&limit={limit}"
-        if verbose:
-            print(f"making request on url: {request_url}")
+    def __create_stac_item_search(self, stac_collection_id:str, location_filter:list[dict], time_interval:list, limit:int, page_size:int = None, 
+                                  compact:bool = False):
+        '''
+            Creates the item search on the catalog of the STAC collection; returns (stac_source, search)
+            compact: requests only the fields of compact items if the STAC API supports the fields extension
+        '''
+        stac_source = self.__get_stac_source(stac_collection_id=stac_collection_id)
+        api_link = self.stac_source_dict[stac_source]['api_link']
+        catalog = self.__get_cached_catalog(api_link)
         
-        response = requests.get(request_url)
-        try:
-            response_dict = json.loads(response.text)
-        except Exception as e:
-            print(f"Exception in parsing response - {e}")
-            print(f"Status code: {response.status_code}")
-            response_dict = {}
-
-        results = response_dict.get('results', [])
+        location_filter = self.__get_geojson_from_location_filters(location_filter)
+        time_interval = self.__get_time_interval(time_interval)
         
-        # transform results to fit standardized interface
-        transformed_results = []
-        for result in results:
-            title = result.get('title', '')
-            url = result.get('url', '')
-            text = result.get('textSnippet', '')
-            transformed_results.append({
-                'id': uuid.uuid4(), 
-                'title': title, 
-                'url': url, 
-                'text': text, 
-                'is_html': False,
-                'locations': [], 
-            })
-        return transformed_results
+        fields = None
+        if compact and catalog.conforms_to(ConformanceClasses.FIELDS):
+            fields = STAC_ITEM_COMPACT_FIELDS
+        
+        search = catalog.search(
+            max_items = limit, 
+            limit = page_size, 
+            collections = stac_collection_id, 
+            intersects = location_filter, 
+            datetime = time_interval, 
+            fields = fields, 
+        )
+        return stac_source, search
 
-    def __make_web_query_mosaic_webindex(self, query:str, limit:int = 1000, location_filter:dict={}, verbose:bool = False) -> list[dict]:
-        bbox = self.__get_bbox_from_location_filters(location_filter=location_filter)
-        if bbox:
-            # bbox is S,W,N,E
-            request_url = f"{MOSAIC_ENDPOINT}search?q={query}&index={DEMO_INDEX_MOSAIC}&limit={limit}&east={bbox[3]}&west={bbox[1]}&north={bbox[2]}&south={bbox[0]}"
-        else:
-            request_url = f"{MOSAIC_ENDPOINT}search?q={query}&index={DEMO_INDEX_MOSAIC}&limit={limit}"
-        if verbose:
-            print(f"making request on url: {request_url}")
-        response = requests.get(request_url)
+    def __transform_stac_item(self, item_dict:dict, stac_source:str) -> dict:
         try:
-            response_dict = json.loads(response.text)
+            # catalogs have different paths to access preview img -> temporary solution: hardcoded paths
+            if stac_source == 'planetary_computer_collections':
+                item_dict['img_link'] = item_dict.get('assets', {}).get('rendered_preview', {}).get('href')
+            elif stac_source == 'geoservice_collections':
+                item_dict['img_link'] = item_dict.get('assets', {}).get('thumbnail', {}).get('href')
+            else:
+                # image not available for terrabyte stac items
+                item_dict['img_link'] = None            
         except Exception as e:
-            print(f"Exception in parsing response - {e}")
-            print(f"Status code: {response.status_code}")
-            response_dict = {}
-
-        results = response_dict.get('results', [])
-        if not results:
-            return []
+            print(e)
+            print("failed to load rendered preview (planetary computer)")
+            item_dict['img_link'] = None
+        return item_dict
 
-        results = results[0]['dlrprototype']
-        
-        # transform results to fit standardized interface
-        transformed_results = []
-        for result in results:
-            title = result.get('title', '')
-            url = result.get('url', '')
-            text = result.get('textSnippet', '')
-            locations = result.get('locations', [])
-            locations = self.__transform_locations_from_web_query(locations)
-            transformed_results.append({
-                'id': uuid.uuid4(), 
-                'title': title, 
-                'url': url, 
-                'text': text, 
-                'is_html': False,
-                'locations': locations, 
-            })
-        return transformed_results
-    
-    def __transform_locations_from_web_query(self, raw_locations_list):
-        locations = []
-        # for now, only the first location is parsed, rest is discarded
-        for location in raw_locations_list:
-            loc_name = location.get('locationName')
-            loc_entries = location.get('locationEntries', [])
-            points = []
-            if len(loc_entries) > 1:
-                print(loc_entries)
-            for entry in loc_entries:
-                lat = entry['latitude']
-                long = entry['longitude']
-                # TODO fetch other info (e.g. country code)
-                points.append((long, lat))
-            multipoint_geojson = geojson.MultiPoint(points)
-            location = {
-                'name': loc_name, 
-                'geojson': multipoint_geojson
-            }
-            locations.append(location)
-            break
-        return locations
+    def __project_stac_item(self, item_dict:dict) -> dict:
+        # trims the item to the compact fields (STAC API might not support the fields extension)
+        return {
+            'type': item_dict.get('type', 'Feature'), 
+            'id': item_dict.get('id'), 
+            'collection': item_dict.get('collection'), 
+            'geometry': item_dict.get('geometry'), 
+            'bbox': item_dict.get('bbox'), 
+            'properties': {
+                'datetime': item_dict.get('properties', {}).get('datetime'), 
+            }, 
+            'img_link': item_dict.get('img_link'), 
+        }
 
-# STAC QUERY HELPER FUNCTIONS
-    def __get_catalog(self, catalog_url:str):
-        if "planetarycomputer" in catalog_url:
-            catalog = pystac_client.Client.open(catalog_url, modifier=planetary_computer.sign_inplace)
-        else:
-            catalog = pystac_client.Client.open(catalog_url)
-        return catalog
+    def __get_stac_geo_candidates(self, stac_index, geometry:dict):
+        '''
+            Returns a boolean mask over the rows of the STAC vector index (collections with extent intersecting the geometry)
+            Uses the geo index on extent_geometry in ArangoDB; returns None if the query fails
+        '''
+        try:
+            result = self.db.AQLQuery(STAC_GEO_CANDIDATES_QUERY, bindVars={'geometry': geometry}, batchSize=1000, rawResults=True)
+            candidate_ids = [node_id for node_id in result]
+        except Exception as e:
+            print(e)
+            print("error - geo query on STAC collection extents failed; using in-memory extent index")
+            return None
+        return np.isin(stac_index.ids, candidate_ids)
 
     def __get_bbox_from_location_filters(self, location_filter:dict):
         if not isinstance(location_filter, dict) or not location_filter:
@@ -484,41 +814,36 @@ class DataRetriever:
         
         if location_filter['type'] == 'bbox':
             return location_filter['coords']
-        else:
-            # TODO handle different shapes
+        # other shapes (polygon) -> bbox of the shape
+        geometry = self.__get_geojson_from_location_filters(location_filter)
+        if not geometry:
+            return None
+        west, south, east, north = get_bbox_from_geometry(geometry)
+        # location filter bbox has format: lat/long lat/long; (S,W,N,E)
+        return [south, west, north, east]
+
+    def __get_location_geometry(self, location_filter:dict) -> LocationGeometry:
+        ''' Returns the prepared geometry of the location filter (None if no location filter is set) '''
+        geometry = self.__get_geojson_from_location_filters(location_filter)
+        if not geometry:
+            return None
+        try:
+            return LocationGeometry(geometry)
+        except Exception as e:
+            print(e)
+            print(f"error - invalid location filter geometry {geometry}")
             return None
         
-    def __filter_stac_collections_by_location(self, stac_collection_list, location_filter):
-        print(location_filter)
-        filtered_list = []
+    def __filter_stac_collections_by_location(self, stac_collection_list, location_geometry:LocationGeometry):
+        # one vectorized intersection test over the extents of all collections
+        extents = []
         for stac_collection in stac_collection_list:
             stac_collection_bbox_list = stac_collection.get('stac', {}).get('extent', {}).get('spatial', {}).get('bbox', {})
             if not stac_collection_bbox_list:
                 print(f"error - did not find spatial extent for stac collection! {stac_collection.get('stac', {}).get('_id')}")
-            
-            # id = stac_collection.get('stac', {}).get('_id')
-            for bbox in stac_collection_bbox_list:
-                if self.__bbox_overlaps(bbox, location_filter):
-                    filtered_list.append(stac_collection)
-                    break
-
-        return filtered_list
-            
-    def __bbox_overlaps(self, spatial_extent_bbox, location_filter_bbox):
-        ''' Returns true if at least one point of bbox1 is inside bbox2 (intersection OR containment) 
-        '''
-        
-        # spatial extent bbox has format: long/lat long/lat; (W,S,E,N)
-        # location filter bbox has format: lat/long lat/long; (S,W,N,E)
-        bbox1 = [spatial_extent_bbox[1], spatial_extent_bbox[0], spatial_extent_bbox[3], spatial_extent_bbox[2]]
-        bbox2 = [location_filter_bbox[0], location_filter_bbox[1], location_filter_bbox[2], location_filter_bbox[3]]
-        
-        if (bbox1[3] < bbox2[1] or bbox1[1] > bbox2[3] or bbox1[2] < bbox2[0] or bbox1[0] > bbox2[2]):
-            # no intersection
-            return False
-        
-        # bbox1 and bbox2 intersect in some way 
-        return True
+            extents.append(stac_collection_bbox_list)
+        mask = ExtentIndex(extents).query(location_geometry.bbox, geometry=location_geometry)
+        return [stac_collection for stac_collection, keep in zip(stac_collection_list, mask) if keep]
     
     
     def __get_geojson_from_location_filters(self, location_filter:dict):
@@ -582,22 +907,40 @@ class DataRetriever:
 
     def __get_stac_source(self, stac_collection_id:str):
         ''' 
-            Performs an ArangoQuery to determine the source of the STAC collection
+            Determines the source of the STAC collection from the precomputed collection -> source map
             Returns a string which identifies the source
         '''
+        return self.__get_stac_sources([stac_collection_id]).get(stac_collection_id)
+
+    def __get_stac_sources(self, stac_collection_ids:list[str]) -> dict:
+        '''
+            Determines the sources of many STAC collections at once
+            Returns a dictionary stac_collection_id -> STAC source key (None if the source was not found)
+        '''
+        self.refresh_stac_sources()
+        stac_sources = {stac_collection_id: self.collection_source_map.get(stac_collection_id) for stac_collection_id in stac_collection_ids}
+        missing_ids = [stac_collection_id for stac_collection_id, stac_source in stac_sources.items() if stac_source is None]
+        if missing_ids:
+            # collections are not in map (yet) -> fall back to one graph query for all of them
+            stac_sources.update(self.__query_stac_sources(missing_ids))
+        return stac_sources
+
+    def __query_stac_sources(self, stac_collection_ids:list[str]) -> dict:
+        ''' 
+            Performs an ArangoQuery to determine the sources of the STAC collections
+            Returns a dictionary stac_collection_id -> STAC source key
+        '''
         query_params = {
-            'doc_id': stac_collection_id, 
+            'doc_ids': stac_collection_ids, 
             'graph_name': self.graph_name, 
         }
         try:
-            # get key from first (and only) element
-            response = self.db.AQLQuery(STAC_SOURCE_QUERY, bindVars=query_params, rawResults=True)
-            #print(response)
-            return response[0].get('_key', None)
+            response = self.db.AQLQuery(STAC_SOURCES_QUERY, bindVars=query_params, batchSize=1000, rawResults=True)
+            return {entry['collection']: entry['source'] for entry in response}
         except Exception as e:
             print(e)
-            print(f"error - could not load stac collection node with id {stac_collection_id}")
-            return None
+            print(f"error - could not load stac collection nodes with ids {stac_collection_ids}")
+            return {}
     
     def __get_time_interval_source_code(self, time_interval:list) -> str:
         return f"""
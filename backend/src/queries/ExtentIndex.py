@@ -0,0 +1,156 @@
+import math
+import numpy as np
+
+from queries.LonLatGrid import LonLatGrid, intersects_bbox
+
+
+# size of the grid cells in degrees
+EXTENT_GRID_CELL_SIZE = 10.0
+
+# boxes that cover more cells are not stored in the grid but checked on every query (e.g. global collections)
+EXTENT_GRID_MAX_CELLS = 32
+
+# GeoJSON geometries of extents: boxes are split into strips of at most this width (degrees) and their edges along
+# parallels get a vertex every EXTENT_GEOMETRY_STEP degrees (edges are geodesics in ArangoDB, not parallels)
+EXTENT_GEOMETRY_MAX_WIDTH = 90.0
+EXTENT_GEOMETRY_STEP = 10.0
+# points on the poles are moved slightly (vertices with different longitude would be identical)
+EXTENT_GEOMETRY_MAX_LAT = 89.999
+
+
+
+class ExtentIndex:
+    # in-memory grid index over the spatial extents (bbox lists) of STAC collections
+    # query() returns a boolean mask over the rows (collections) whose extent intersects the requested bbox
+
+    def __init__(self, extents:list, cell_size:float = EXTENT_GRID_CELL_SIZE, max_cells:int = EXTENT_GRID_MAX_CELLS) -> None:
+        '''
+            extents: one entry per row, the list of bboxes (W,S,E,N) of the spatial extent (None if the row has no extent)
+        '''
+        self.size = len(extents)
+        self.grid = LonLatGrid(cell_size)
+
+        owners = []
+        boxes = []
+        for row, extent in enumerate(extents):
+            for box in get_extent_boxes(extent):
+                owners.append(row)
+                boxes.append(box)
+        self.owners = np.asarray(owners, dtype=np.int64)
+        self.boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+
+        # grid cell -> indices of the boxes that intersect the cell; large boxes are kept separately
+        cells = {}
+        large_boxes = []
+        for i, box in enumerate(boxes):
+            x_min, y_min, x_max, y_max = self.grid.cell_range(box)
+            if (x_max - x_min + 1) * (y_max - y_min + 1) > max_cells:
+                large_boxes.append(i)
+                continue
+            for x in range(x_min, x_max + 1):
+                for y in range(y_min, y_max + 1):
+                    cells.setdefault((x, y), []).append(i)
+        self.cells = {cell: np.asarray(box_ids, dtype=np.int64) for cell, box_ids in cells.items()}
+        self.large_boxes = np.asarray(large_boxes, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def query(self, bbox:list[float], geometry = None):
+        '''
+            Returns a boolean mask over all rows; true if one of the boxes of the row intersects the bbox (W,S,E,N)
+            geometry: optional LocationGeometry (e.g. polygon); candidates of its bbox are tested exactly against the geometry
+        '''
+        mask = np.zeros(self.size, dtype=bool)
+        if geometry is not None:
+            bbox = geometry.bbox
+        for query_box in get_extent_boxes([bbox]):
+            candidates = [self.large_boxes]
+            x_min, y_min, x_max, y_max = self.grid.cell_range(query_box)
+            for x in range(x_min, x_max + 1):
+                for y in range(y_min, y_max + 1):
+                    box_ids = self.cells.get((x, y))
+                    if box_ids is not None:
+                        candidates.append(box_ids)
+            candidate_ids = np.unique(np.concatenate(candidates))
+            boxes = self.boxes[candidate_ids]
+            if geometry is not None:
+                intersects = geometry.intersects_boxes(boxes)
+            else:
+                intersects = intersects_bbox(boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3], query_box)
+            mask[self.owners[candidate_ids[intersects]]] = True
+        return mask
+
+
+def get_extent_boxes(extent) -> list[list[float]]:
+    '''
+        Returns the 2D boxes (W,S,E,N) of a STAC spatial extent (list of bboxes)
+        3D bboxes are reduced to 2D; boxes crossing the antimeridian (W > E) are split into two boxes
+    '''
+    if not extent:
+        return []
+    if isinstance(extent[0], (int, float)):
+        # single bbox instead of list of bboxes
+        extent = [extent]
+    boxes = []
+    for box in extent:
+        try:
+            if len(box) == 6:
+                box = [box[0], box[1], box[3], box[4]]
+            west, south, east, north = [float(coord) for coord in box]
+        except Exception as e:
+            print(e)
+            print(f"warning - skipping invalid bbox {box}")
+            continue
+        if west > east:
+            boxes.append([west, south, 180.0, north])
+            boxes.append([-180.0, south, east, north])
+        else:
+            boxes.append([west, south, east, north])
+    return boxes
+
+
+def get_extent_geometry(extent) -> dict:
+    '''
+        Returns the GeoJSON footprint (Polygon or MultiPolygon) of a STAC spatial extent (list of bboxes)
+        Returns None if the extent has no valid bbox
+    '''
+    polygons = []
+    for west, south, east, north in get_extent_boxes(extent):
+        south = max(south, -EXTENT_GEOMETRY_MAX_LAT)
+        north = min(north, EXTENT_GEOMETRY_MAX_LAT)
+        n_strips = max(1, math.ceil((east - west) / EXTENT_GEOMETRY_MAX_WIDTH))
+        width = (east - west) / n_strips
+        for i in range(n_strips):
+            strip_west = west + i * width
+            strip_east = west + (i + 1) * width if i < n_strips - 1 else east
+            polygons.append([_get_box_ring(strip_west, south, strip_east, north)])
+    if not polygons:
+        return None
+    if len(polygons) == 1:
+        return {'type': 'Polygon', 'coordinates': polygons[0]}
+    return {'type': 'MultiPolygon', 'coordinates': polygons}
+
+
+def orient_polygon(geometry:dict) -> dict:
+    '''
+        Returns the GeoJSON polygon with counter-clockwise outer ring (right-hand rule)
+        Clockwise rings (e.g. drawn by the user) would otherwise describe the complement of the polygon
+    '''
+    if not geometry or geometry.get('type') != 'Polygon':
+        return geometry
+    ring = geometry['coordinates'][0]
+    # shoelace formula: negative area -> clockwise
+    area = sum(ring[i][0] * ring[i+1][1] - ring[i+1][0] * ring[i][1] for i in range(len(ring) - 1))
+    if area >= 0:
+        return geometry
+    return {'type': 'Polygon', 'coordinates': [ring[::-1], *geometry['coordinates'][1:]]}
+
+
+def _get_box_ring(west:float, south:float, east:float, north:float) -> list[list[float]]:
+    # counter-clockwise ring; edges along parallels are densified
+    n_steps = max(1, math.ceil((east - west) / EXTENT_GEOMETRY_STEP))
+    lons = [west + (east - west) * i / n_steps for i in range(n_steps + 1)]
+    ring = [[lon, south] for lon in lons] + [[lon, north] for lon in reversed(lons)]
+    ring.append(ring[0])
+    return ring
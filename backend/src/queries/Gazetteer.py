@@ -0,0 +1,275 @@
+import argparse
+import difflib
+import json
+import math
+import os
+import time
+import unicodedata
+import numpy as np
+
+
+# names are stored as fixed-width byte strings (longer names are truncated)
+GAZETTEER_KEY_LENGTH = 48
+
+# only administrative areas (A) and populated places (P) are indexed by default
+GAZETTEER_FEATURE_CLASSES = ('A', 'P')
+
+# fuzzy lookup: candidates share the first characters and have a similar length
+FUZZY_MIN_LENGTH = 4
+FUZZY_PREFIX_LENGTH = 2
+FUZZY_MAX_LENGTH_DIFF = 2
+FUZZY_MAX_CANDIDATES = 5000
+FUZZY_THRESHOLD = 0.85
+
+# radius (km) of the estimated bbox if the place has no bbox in the bbox file (GeoNames dumps only contain coordinates)
+FEATURE_CODE_RADIUS = {
+    'PCLI': 500.0,
+    'PCLD': 300.0,
+    'ADM1': 150.0,
+    'ADM2': 40.0,
+    'ADM3': 15.0,
+}
+MIN_PLACE_RADIUS = 3.0
+MAX_PLACE_RADIUS = 60.0
+
+# columns of the GeoNames dump (allCountries.txt, cities*.txt)
+GEONAMES_COLUMNS = {
+    'geonameid': 0,
+    'name': 1,
+    'asciiname': 2,
+    'alternatenames': 3,
+    'latitude': 4,
+    'longitude': 5,
+    'feature_class': 6,
+    'feature_code': 7,
+    'population': 14,
+}
+
+GAZETTEER_ARRAYS = ['keys', 'key_rows', 'key_lengths', 'geonameids', 'population', 'bboxes']
+
+# build: parsed rows are converted to numpy arrays in chunks of this size (python objects only for one chunk at a time)
+BUILD_CHUNK_SIZE = 1000000
+
+
+
+class Gazetteer:
+    # offline location resolution from a GeoNames dump
+    # the index consists of numpy arrays that are memory-mapped (only the pages touched by lookups are loaded):
+    #   keys: sorted normalized names (incl. alternate names), key_rows: place row of every key
+    #   geonameids, population, bboxes (W,S,E,N): one row per place
+    # exact lookup is a binary search on keys, fuzzy lookup compares candidates with the same prefix; the most populous place wins
+
+    def __init__(self, index_path:str) -> None:
+        '''
+            Loads (memory-maps) the index that was built with build_gazetteer (see build command at the end of this file)
+        '''
+        self.index_path = index_path
+        with open(os.path.join(index_path, 'meta.json'), 'r') as file:
+            self.meta = json.load(file)
+        for name in GAZETTEER_ARRAYS:
+            setattr(self, name, np.load(os.path.join(index_path, f"{name}.npy"), mmap_mode='r'))
+
+    def __len__(self) -> int:
+        return len(self.geonameids)
+
+    def lookup(self, name:str, fuzzy:bool = True) -> dict:
+        '''
+            Returns the best match {geonameid, bbox (W,S,E,N), population, score} for the place name (None if not found)
+            Exact matches are preferred; ties are resolved by population
+        '''
+        key = normalize_gazetteer_name(name)
+        if not key:
+            return None
+        lo = np.searchsorted(self.keys, key, side='left')
+        hi = np.searchsorted(self.keys, key, side='right')
+        if hi > lo:
+            rows = np.asarray(self.key_rows[lo:hi])
+            row = rows[np.argmax(self.population[rows])]
+            return self.__get_result(row, 1.0)
+        if fuzzy and len(key) >= FUZZY_MIN_LENGTH:
+            return self.__fuzzy_lookup(key)
+        return None
+
+    def get_stats(self) -> dict:
+        return {
+            'places': len(self),
+            'names': len(self.keys),
+            'source': self.meta.get('source'),
+        }
+
+    def __fuzzy_lookup(self, key:bytes) -> dict:
+        # candidates: same prefix and similar length
+        prefix = key[:FUZZY_PREFIX_LENGTH]
+        lo = np.searchsorted(self.keys, prefix, side='left')
+        hi = np.searchsorted(self.keys, prefix + b'\xff', side='left')
+        if hi <= lo:
+            return None
+        idx = np.arange(lo, hi)
+        idx = idx[np.abs(self.key_lengths[lo:hi].astype(np.int64) - len(key)) <= FUZZY_MAX_LENGTH_DIFF]
+        if len(idx) > FUZZY_MAX_CANDIDATES:
+            # only compare the most populous places
+            idx = idx[np.argpartition(-self.population[self.key_rows[idx]], FUZZY_MAX_CANDIDATES - 1)[:FUZZY_MAX_CANDIDATES]]
+
+        query = key.decode('ascii')
+        matcher = difflib.SequenceMatcher(b=query, autojunk=False)
+        best = None
+        for i in idx:
+            matcher.set_seq1(self.keys[i].decode('ascii'))
+            if matcher.real_quick_ratio() < FUZZY_THRESHOLD or matcher.quick_ratio() < FUZZY_THRESHOLD:
+                continue
+            ratio = matcher.ratio()
+            if ratio < FUZZY_THRESHOLD:
+                continue
+            row = self.key_rows[i]
+            # similarity first, population breaks ties
+            rank = (ratio, self.population[row])
+            if best is None or rank > best[0]:
+                best = (rank, row)
+        if best is None:
+            return None
+        return self.__get_result(best[1], best[0][0])
+
+    def __get_result(self, row:int, score:float) -> dict:
+        return {
+            'geonameid': int(self.geonameids[row]),
+            'bbox': [float(coord) for coord in self.bboxes[row]],
+            'population': int(self.population[row]),
+            'score': score,
+        }
+
+
+def build_gazetteer(dump_path:str, index_path:str, bbox_path:str = None, min_population:int = 0,
+                    feature_classes:tuple = GAZETTEER_FEATURE_CLASSES):
+    '''
+        Builds the gazetteer index from a GeoNames dump (allCountries.txt, cities15000.txt, ...)
+        bbox_path: optional tab separated file (geonameid, west, south, east, north) with bboxes of places (e.g. admin areas)
+        Places without bbox get a bbox that is estimated from their feature code / population
+    '''
+    start = time.perf_counter()
+    bbox_dict = _read_bbox_file(bbox_path) if bbox_path else {}
+
+    # chunks of the arrays (numpy) + rows of the current chunk (python lists)
+    chunks = {name: [] for name in ['keys', 'key_rows', 'geonameids', 'population', 'bboxes']}
+    rows = {name: [] for name in chunks}
+    dtypes = {
+        'keys': f"S{GAZETTEER_KEY_LENGTH}", 
+        'key_rows': np.int32, 
+        'geonameids': np.int32, 
+        'population': np.int64, 
+        'bboxes': np.float64, 
+    }
+
+    def flush():
+        for name, values in rows.items():
+            if values:
+                chunks[name].append(np.asarray(values, dtype=dtypes[name]))
+                rows[name] = []
+
+    n_places = 0
+    with open(dump_path, 'r', encoding='utf-8') as file:
+        for line in file:
+            columns = line.rstrip('\n').split('\t')
+            try:
+                if columns[GEONAMES_COLUMNS['feature_class']] not in feature_classes:
+                    continue
+                place_population = int(columns[GEONAMES_COLUMNS['population']] or 0)
+                if place_population < min_population:
+                    continue
+                geonameid = int(columns[GEONAMES_COLUMNS['geonameid']])
+                lat = float(columns[GEONAMES_COLUMNS['latitude']])
+                lon = float(columns[GEONAMES_COLUMNS['longitude']])
+            except (IndexError, ValueError):
+                continue
+            bbox = bbox_dict.get(geonameid)
+            if bbox is None:
+                bbox = _estimate_bbox(lat, lon, columns[GEONAMES_COLUMNS['feature_code']], place_population)
+
+            rows['geonameids'].append(geonameid)
+            rows['population'].append(place_population)
+            rows['bboxes'].append(bbox)
+            names = [columns[GEONAMES_COLUMNS['name']], columns[GEONAMES_COLUMNS['asciiname']]]
+            names += columns[GEONAMES_COLUMNS['alternatenames']].split(',')
+            for key in {normalize_gazetteer_name(name) for name in names}:
+                if key:
+                    rows['keys'].append(key)
+                    rows['key_rows'].append(n_places)
+            n_places += 1
+            if len(rows['keys']) >= BUILD_CHUNK_SIZE:
+                flush()
+    flush()
+
+    def concatenate(name:str):
+        if not chunks[name]:
+            return np.zeros(0, dtype=dtypes[name])
+        array = np.concatenate(chunks[name])
+        chunks[name] = []
+        return array
+
+    keys = concatenate('keys')
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    arrays = {
+        'keys': keys,
+        'key_rows': concatenate('key_rows')[order],
+        'key_lengths': np.char.str_len(keys).astype(np.uint8),
+        'geonameids': concatenate('geonameids'),
+        'population': concatenate('population'),
+        'bboxes': concatenate('bboxes').reshape(-1, 4),
+    }
+    del order
+    # files are replaced one by one (processes that mapped the old index keep the old files); meta.json is written last
+    os.makedirs(index_path, exist_ok=True)
+    for name in GAZETTEER_ARRAYS:
+        tmp_path = os.path.join(index_path, f"{name}.tmp.npy")
+        np.save(tmp_path, arrays[name])
+        os.replace(tmp_path, os.path.join(index_path, f"{name}.npy"))
+    with open(os.path.join(index_path, 'meta.json'), 'w') as file:
+        json.dump({'source': _get_source_info(dump_path, bbox_path), 'min_population': min_population}, file)
+    print(f"Gazetteer - built index with {n_places} places and {len(keys)} names in {time.perf_counter()-start:.2f}s")
+
+
+def normalize_gazetteer_name(name:str) -> bytes:
+    # ascii folded, lower case, collapsed whitespace ("München" -> b"munchen"); truncated to the key length
+    name = unicodedata.normalize('NFKD', name)
+    name = ''.join(char for char in name if not unicodedata.combining(char))
+    name = ' '.join(name.lower().split())
+    return name.encode('ascii', errors='ignore')[:GAZETTEER_KEY_LENGTH].strip()
+
+
+def _estimate_bbox(lat:float, lon:float, feature_code:str, population:int) -> list[float]:
+    radius = FEATURE_CODE_RADIUS.get(feature_code)
+    if radius is None:
+        # populated places: radius grows with population
+        radius = min(max(0.015 * math.sqrt(population), MIN_PLACE_RADIUS), MAX_PLACE_RADIUS)
+    dlat = radius / 111.0
+    dlon = min(radius / (111.0 * max(math.cos(math.radians(lat)), 0.01)), 180.0)
+    return [max(lon - dlon, -180.0), max(lat - dlat, -90.0), min(lon + dlon, 180.0), min(lat + dlat, 90.0)]
+
+
+def _read_bbox_file(bbox_path:str) -> dict:
+    bbox_dict = {}
+    with open(bbox_path, 'r', encoding='utf-8') as file:
+        for line in file:
+            columns = line.rstrip('\n').split('\t')
+            try:
+                bbox_dict[int(columns[0])] = [float(coord) for coord in columns[1:5]]
+            except (IndexError, ValueError):
+                continue
+    return bbox_dict
+
+
+def _get_source_info(dump_path:str, bbox_path:str = None) -> list:
+    # index is rebuilt if one of the source files changed
+    return [[path, os.path.getsize(path), os.path.getmtime(path)] for path in [dump_path, bbox_path] if path]
+
+
+if __name__ == '__main__':
+    # build command (the API only loads the index), e.g. from the backend directory:
+    # python src/queries/Gazetteer.py assets/allCountries.txt assets/gazetteer --min-population 1000
+    parser = argparse.ArgumentParser(description="Builds the gazetteer index from a GeoNames dump")
+    parser.add_argument('dump_path', help="GeoNames dump (allCountries.txt, cities15000.txt, ...)")
+    parser.add_argument('index_path', help="output directory of the index (gazetteer.index_path in the config)")
+    parser.add_argument('--bbox-path', default=None, help="tab separated file with bboxes (geonameid, west, south, east, north)")
+    parser.add_argument('--min-population', type=int, default=0, help="places with smaller population are not indexed")
+    args = parser.parse_args()
+    build_gazetteer(args.dump_path, args.index_path, bbox_path=args.bbox_path, min_population=args.min_population)
@@ -0,0 +1,108 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from queries.LRUCache import LRUCache
+
+
+GEOCODE_CACHE_PATH = 'assets/geocode_cache.sqlite'
+
+# lifetime (seconds) of cached geocoding results; misses (place not found) are cached for a shorter time
+GEOCODE_TTL = 30 * 24 * 3600
+GEOCODE_NEGATIVE_TTL = 24 * 3600
+
+# lookup status
+GEOCODE_FRESH = 'fresh'
+GEOCODE_STALE = 'stale' # expired entry; should be refreshed, but can be used if the geocoding service fails
+GEOCODE_MISSING = 'missing'
+
+
+
+class GeocodeCache:
+    # persistent geocoding cache (SQLite) keyed on the normalized place name, with an in-memory LRU cache in front
+    # stores bboxes and misses (bbox None); entries survive restarts and are refreshed after their TTL
+
+    def __init__(self, path:str = GEOCODE_CACHE_PATH, ttl:float = GEOCODE_TTL, negative_ttl:float = GEOCODE_NEGATIVE_TTL, memory_size:int = 4096) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        # value: (bbox, expiry timestamp (unix time))
+        self.memory_cache = LRUCache(maxsize=memory_size)
+        self.lock = threading.Lock()
+        self.connection = None
+        try:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.connection = sqlite3.connect(path, check_same_thread=False)
+            # WAL: readers of other processes (workers) are not blocked by writes
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS geocode (name TEXT PRIMARY KEY, bbox TEXT, expires REAL)")
+            self.connection.commit()
+        except Exception as e:
+            print(e)
+            print(f"error - could not open geocode cache {path}; using in-memory cache only")
+            self.connection = None
+
+    def lookup(self, name:str) -> tuple[str, list]:
+        '''
+            Returns (status, bbox) for the place name; bbox is None for cached misses
+            status: GEOCODE_FRESH, GEOCODE_STALE (expired) or GEOCODE_MISSING (not cached)
+        '''
+        key = normalize_place_name(name)
+        entry = self.memory_cache.get(key)
+        if entry is None:
+            entry = self.__read(key)
+            if entry is None:
+                return GEOCODE_MISSING, None
+            self.memory_cache.set(key, entry)
+        bbox, expires = entry
+        if expires <= time.time():
+            return GEOCODE_STALE, bbox
+        return GEOCODE_FRESH, bbox
+
+    def set(self, name:str, bbox:list):
+        ''' Stores the geocoding result of the place name (bbox None -> place was not found) '''
+        key = normalize_place_name(name)
+        expires = time.time() + (self.ttl if bbox is not None else self.negative_ttl)
+        self.memory_cache.set(key, (bbox, expires))
+        if self.connection is None:
+            return
+        try:
+            with self.lock:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO geocode (name, bbox, expires) VALUES (?, ?, ?)",
+                    (key, json.dumps(bbox) if bbox is not None else None, expires),
+                )
+                self.connection.commit()
+        except Exception as e:
+            print(e)
+            print(f"error - could not write geocode cache entry for {key}")
+
+    def get_stats(self) -> dict:
+        stats = {'memory': self.memory_cache.get_stats(), 'entries': None}
+        if self.connection is not None:
+            with self.lock:
+                stats['entries'] = self.connection.execute("SELECT COUNT(*) FROM geocode").fetchone()[0]
+        return stats
+
+    def __read(self, key:str) -> tuple[list, float]:
+        if self.connection is None:
+            return None
+        try:
+            with self.lock:
+                row = self.connection.execute("SELECT bbox, expires FROM geocode WHERE name = ?", (key,)).fetchone()
+        except Exception as e:
+            print(e)
+            print(f"error - could not read geocode cache entry for {key}")
+            return None
+        if row is None:
+            return None
+        bbox = json.loads(row[0]) if row[0] is not None else None
+        return bbox, row[1]
+
+
+def normalize_place_name(name:str) -> str:
+    # case and whitespace do not change the geocoding result ("Munich", " munich ")
+    return ' '.join(name.lower().split())
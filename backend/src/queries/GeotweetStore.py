@@ -0,0 +1,230 @@
+import json
+import math
+import re
+import threading
+import time
+from datetime import datetime, timezone
+import numpy as np
+
+from queries.LonLatGrid import LonLatGrid, intersects_bbox
+
+
+# size of the grid cells of the spatial index in degrees
+GRID_CELL_SIZE = 1.0
+
+# timestamp format of the twitter API (ISO 8601 timestamps are supported as well)
+TWITTER_TIME_FORMAT = '%a %b %d %H:%M:%S %z %Y'
+
+# the GeoJSON file is parsed in chunks of this size (characters); features are decoded one at a time
+READ_CHUNK_SIZE = 1024 * 1024
+
+FEATURES_PATTERN = re.compile(r'"features"\s*:\s*\[')
+
+
+
+class GeotweetStore:
+    # columnar in-memory store for geotweets (GeoJSON point features)
+    # coordinates/timestamps are numpy arrays, the flood flags a boolean mask; a grid index over the coordinates answers bbox queries
+    # the GeoJSON file is streamed once (on first request); only the columns and the byte range of every feature are kept in memory,
+    # the properties of the requested page are read from the file
+
+    def __init__(self, path:str, time_property:str = 'created_at', cell_size:float = GRID_CELL_SIZE) -> None:
+        self.path = path
+        self.time_property = time_property # property that holds the timestamp of the tweet
+        self.grid = LonLatGrid(cell_size)
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.lon = np.zeros(0)
+        self.lat = np.zeros(0)
+        self.timestamps = np.zeros(0) # unix timestamps (NaN if the tweet has no valid timestamp)
+        self.flood = np.zeros(0, dtype=bool)
+        # byte range of the features in the file
+        self.feature_offsets = np.zeros(0, dtype=np.int64)
+        self.feature_lengths = np.zeros(0, dtype=np.int64)
+        # grid index: row indices sorted by grid cell; tweets of cell c are stored in cell_order[cell_offsets[c]:cell_offsets[c+1]]
+        self.cell_order = np.zeros(0, dtype=np.int64)
+        self.cell_offsets = np.zeros(len(self.grid) + 1, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.lon)
+
+    def load(self):
+        ''' Loads the GeoJSON file into the columnar store and builds the grid index (only once) '''
+        if self.loaded:
+            return
+        with self.lock:
+            if self.loaded:
+                # another thread loaded the store in the meantime
+                return
+            start = time.perf_counter()
+            lon = []
+            lat = []
+            timestamps = []
+            flood = []
+            feature_offsets = []
+            feature_lengths = []
+            try:
+                for feature_offset, feature_length, feature in _iter_features(self.path):
+                    try:
+                        coordinates = feature['geometry']['coordinates']
+                        tweet_lon, tweet_lat = float(coordinates[0]), float(coordinates[1])
+                    except Exception as e:
+                        print(e)
+                        continue
+                    tweet_properties = feature.get('properties') or {}
+                    lon.append(tweet_lon)
+                    lat.append(tweet_lat)
+                    timestamps.append(_parse_time(tweet_properties.get(self.time_property)))
+                    flood.append(bool(tweet_properties.get('contains_flood')))
+                    feature_offsets.append(feature_offset)
+                    feature_lengths.append(feature_length)
+            except Exception as e:
+                print(e)
+                print(f"error - could not load geotweets from {self.path}")
+
+            self.lon = np.asarray(lon, dtype=np.float64)
+            self.lat = np.asarray(lat, dtype=np.float64)
+            self.timestamps = np.asarray(timestamps, dtype=np.float64)
+            self.flood = np.asarray(flood, dtype=bool)
+            self.feature_offsets = np.asarray(feature_offsets, dtype=np.int64)
+            self.feature_lengths = np.asarray(feature_lengths, dtype=np.int64)
+            self.__build_grid_index()
+            self.loaded = True
+            print(f"GeotweetStore - loaded {len(self)} geotweets ({int(self.flood.sum())} flood tweets) in {time.perf_counter()-start:.2f}s")
+
+    def query(self, bbox:list[float] = None, time_interval:list = None, only_floods:bool = False, limit:int = 100, offset:int = 0) -> list[dict]:
+        '''
+            Returns the geotweets (GeoJSON features) that match the filters; ordered as in the source file
+            bbox: W,S,E,N; time_interval: [start, end] (ISO 8601 strings or datetime objects)
+            limit/offset: pagination
+        '''
+        self.load()
+        if bbox is not None:
+            candidates = self.__get_bbox_candidates(bbox)
+        else:
+            candidates = np.arange(len(self))
+
+        mask = np.ones(len(candidates), dtype=bool)
+        if only_floods:
+            mask &= self.flood[candidates]
+        if time_interval is not None:
+            start, end = _parse_time(time_interval[0]), _parse_time(time_interval[1])
+            timestamps = self.timestamps[candidates]
+            if not math.isnan(start):
+                mask &= timestamps >= start
+            if not math.isnan(end):
+                mask &= timestamps <= end
+        page = candidates[mask][offset:offset+limit]
+        return self.__get_features(page)
+
+    def __get_bbox_candidates(self, bbox:list[float]):
+        # collects the tweets of all grid cells that intersect the bbox; exact check on the coordinates afterwards
+        x_min, y_min, x_max, y_max = self.grid.cell_range(bbox)
+        # cells of one grid row are stored consecutively -> one slice per row
+        slices = []
+        for y in range(y_min, y_max + 1):
+            start = self.cell_offsets[y * self.grid.n_cols + x_min]
+            end = self.cell_offsets[y * self.grid.n_cols + x_max + 1]
+            if end > start:
+                slices.append(self.cell_order[start:end])
+        if not slices:
+            return np.zeros(0, dtype=np.int64)
+        candidates = np.sort(np.concatenate(slices))
+        lon = self.lon[candidates]
+        lat = self.lat[candidates]
+        return candidates[intersects_bbox(lon, lat, lon, lat, bbox)]
+
+    def __build_grid_index(self):
+        x, y = self.grid.cell_index(self.lon, self.lat)
+        cells = y * self.grid.n_cols + x
+        self.cell_order = np.argsort(cells, kind='stable')
+        self.cell_offsets = np.zeros(len(self.grid) + 1, dtype=np.int64)
+        self.cell_offsets[1:] = np.cumsum(np.bincount(cells, minlength=len(self.grid)))
+
+    def __get_features(self, rows) -> list[dict]:
+        # properties are read from the byte ranges of the features (in file order -> forward seeks only)
+        properties = {}
+        with open(self.path, 'rb') as file:
+            for i in np.sort(rows):
+                file.seek(self.feature_offsets[i])
+                properties[i] = json.loads(file.read(self.feature_lengths[i])).get('properties') or {}
+        return [
+            {
+                'type': 'Feature',
+                'geometry': {
+                    'type': 'Point',
+                    'coordinates': [float(self.lon[i]), float(self.lat[i])],
+                },
+                'properties': properties[i],
+            }
+            for i in rows
+        ]
+
+
+def _iter_features(path:str, chunk_size:int = READ_CHUNK_SIZE):
+    '''
+        Generator that yields (byte offset, byte length, feature) for the features of a GeoJSON FeatureCollection
+        The file is read in chunks; only the current chunk (at least one feature) is kept in memory
+    '''
+    decoder = json.JSONDecoder()
+    # newline='': line endings are not translated (character offsets must match the bytes of the file, e.g. CRLF files)
+    with open(path, 'r', encoding='utf-8', newline='') as file:
+        buffer = ''
+        # start of the features array
+        match = None
+        while match is None:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                return
+            buffer += chunk
+            match = FEATURES_PATTERN.search(buffer)
+        pos = match.end()
+        byte_pos = len(buffer[:pos].encode('utf-8')) # byte offset of buffer[pos] in the file
+        eof = False
+        while True:
+            # skip separators between features
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+                byte_pos += 1
+            if pos < len(buffer) and buffer[pos] == ']':
+                return
+            try:
+                if pos >= len(buffer):
+                    raise ValueError("end of buffer")
+                feature, end = decoder.raw_decode(buffer, pos)
+            except ValueError:
+                # feature is not complete yet -> read next chunk (consumed part of the buffer is dropped)
+                if eof:
+                    if pos < len(buffer):
+                        raise
+                    return
+                chunk = file.read(chunk_size)
+                eof = not chunk
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+            byte_length = len(buffer[pos:end].encode('utf-8'))
+            yield byte_pos, byte_length, feature
+            pos = end
+            byte_pos += byte_length
+
+
+def _parse_time(value) -> float:
+    # returns the unix timestamp of an ISO 8601 string/twitter timestamp/datetime (NaN if it can not be parsed)
+    if value is None:
+        return math.nan
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        dt = value
+    else:
+        try:
+            dt = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        except ValueError:
+            try:
+                dt = datetime.strptime(str(value), TWITTER_TIME_FORMAT)
+            except ValueError:
+                return math.nan
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
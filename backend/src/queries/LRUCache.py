@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+
+class LRUCache:
+    # bounded, thread-safe least-recently-used cache with optional time-to-live for entries
+
+    def __init__(self, maxsize:int = 1024, ttl:float = None, maxbytes:int = None, sizeof = None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl # default lifetime in seconds (None -> entries do not expire)
+        self.maxbytes = maxbytes # memory budget (None -> only number of entries is bounded)
+        self.sizeof = sizeof # function that estimates the size of a value in bytes (required for maxbytes)
+        self.entries = OrderedDict() # key -> (expiry timestamp, value, size)
+        self.nbytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key) -> bool:
+        with self.lock:
+            return self.__get_entry(key) is not None
+
+    def get(self, key, default=None):
+        '''
+            Returns the cached value for key (and marks it as recently used)
+            Returns default if the key is not cached or the entry is expired
+        '''
+        with self.lock:
+            entry = self.__get_entry(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl:float = None):
+        '''
+            Stores the value for key; evicts the least recently used entries if the cache is full
+            ttl: lifetime of this entry in seconds (overrides the default lifetime of the cache)
+        '''
+        ttl = ttl if ttl is not None else self.ttl
+        expiry = time.monotonic() + ttl if ttl is not None else None
+        size = self.sizeof(value) if self.maxbytes is not None else 0
+        with self.lock:
+            self.__remove(key)
+            if self.maxbytes is not None and size > self.maxbytes:
+                # value does not fit into the memory budget at all
+                return
+            self.entries[key] = (expiry, value, size)
+            self.nbytes += size
+            while len(self.entries) > self.maxsize or (self.maxbytes is not None and self.nbytes > self.maxbytes):
+                self.__remove(next(iter(self.entries)))
+
+    def delete(self, key):
+        with self.lock:
+            self.__remove(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+    def get_stats(self) -> dict:
+        ''' Returns size and hit/miss counters of the cache '''
+        with self.lock:
+            requests = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'maxsize': self.maxsize,
+                'nbytes': self.nbytes if self.maxbytes is not None else None,
+                'maxbytes': self.maxbytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / requests if requests else None,
+            }
+
+    def __get_entry(self, key):
+        # returns (expiry, value, size) or None; removes expired entries (lock must be held by caller)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expiry = entry[0]
+        if expiry is not None and expiry <= time.monotonic():
+            self.__remove(key)
+            return None
+        return entry
+
+    def __remove(self, key):
+        # lock must be held by caller
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.nbytes -= entry[2]
@@ -0,0 +1,39 @@
+import numpy as np
+import shapely
+from shapely.geometry import shape
+
+from queries.LonLatGrid import intersects_bbox
+
+
+
+class LocationGeometry:
+    # geometry of a location filter (bbox or polygon drawn in the frontend), prepared once per request
+    # intersection tests against many boxes run in one vectorized pass: bbox pre-check first, exact polygon test only for the remaining boxes
+
+    def __init__(self, geometry:dict) -> None:
+        self.geometry = shape(geometry)
+        if not self.geometry.is_valid:
+            # e.g. self-intersecting polygon
+            self.geometry = shapely.make_valid(self.geometry)
+        shapely.prepare(self.geometry)
+        self.bbox = list(self.geometry.bounds) # W,S,E,N
+        # rectangles are fully described by their bbox -> exact test is not needed
+        self.is_box = self.geometry.equals(shapely.box(*self.bbox))
+
+    def intersects_boxes(self, boxes):
+        ''' Returns a boolean array; true if the box (W,S,E,N) intersects the geometry '''
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        mask = intersects_bbox(boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3], self.bbox)
+        if self.is_box or not mask.any():
+            return mask
+        idx = np.flatnonzero(mask)
+        mask[idx] = shapely.intersects(self.geometry, shapely.box(boxes[idx, 0], boxes[idx, 1], boxes[idx, 2], boxes[idx, 3]))
+        return mask
+
+    def intersects_geometries(self, geometries:list[dict]):
+        ''' Returns a boolean array; true if the GeoJSON geometry (e.g. footprint of a STAC item) intersects the geometry (None -> false) '''
+        mask = np.zeros(len(geometries), dtype=bool)
+        idx = [i for i, geometry in enumerate(geometries) if geometry]
+        if idx:
+            mask[idx] = shapely.intersects(self.geometry, [shape(geometries[i]) for i in idx])
+        return mask
@@ -0,0 +1,56 @@
+import math
+import numpy as np
+
+
+
+class LonLatGrid:
+    # regular lon/lat grid over the world; cell (0, 0) starts at (-180, -90)
+    # used by the spatial indexes (STAC extents, geotweets) and the STAC item tile cache
+
+    def __init__(self, cell_size:float) -> None:
+        self.cell_size = cell_size
+        self.n_cols = math.ceil(360 / cell_size)
+        self.n_rows = math.ceil(180 / cell_size)
+
+    def __len__(self) -> int:
+        return self.n_cols * self.n_rows
+
+    def cell_index(self, lon, lat):
+        '''
+            Returns the cell (x, y) of the coordinates (scalars or numpy arrays)
+            Coordinates outside of the world are clamped; points on the upper border belong to the last cell
+        '''
+        x = np.minimum(np.floor((np.clip(lon, -180.0, 180.0) + 180.0) / self.cell_size).astype(np.int64), self.n_cols - 1)
+        y = np.minimum(np.floor((np.clip(lat, -90.0, 90.0) + 90.0) / self.cell_size).astype(np.int64), self.n_rows - 1)
+        if np.ndim(x) == 0:
+            return int(x), int(y)
+        return x, y
+
+    def cell_range(self, bbox:list[float]) -> tuple[int, int, int, int]:
+        ''' Returns the cells (x_min, y_min, x_max, y_max) covered by the bbox (W,S,E,N) '''
+        return (*self.cell_index(bbox[0], bbox[1]), *self.cell_index(bbox[2], bbox[3]))
+
+    def cell_bbox(self, x:int, y:int) -> list[float]:
+        ''' Returns the bbox (W,S,E,N) of the cell '''
+        return [
+            x * self.cell_size - 180.0,
+            y * self.cell_size - 90.0,
+            min((x + 1) * self.cell_size - 180.0, 180.0),
+            min((y + 1) * self.cell_size - 90.0, 90.0),
+        ]
+
+
+def intersects_bbox(west, south, east, north, bbox:list[float]):
+    '''
+        Returns true if the box (W,S,E,N) intersects the bbox (W,S,E,N); boxes touching the bbox intersect
+        The coordinates can be numpy arrays (one box per element -> boolean array), points are boxes with west == east and south == north
+    '''
+    return np.logical_not((east < bbox[0]) | (west > bbox[2]) | (north < bbox[1]) | (south > bbox[3]))
+
+
+def get_bbox_from_geometry(geometry:dict) -> list[float]:
+    ''' Returns the bbox (W,S,E,N) of a GeoJSON polygon '''
+    coordinates = [coord for ring in geometry['coordinates'] for coord in ring]
+    lons = [coord[0] for coord in coordinates]
+    lats = [coord[1] for coord in coordinates]
+    return [min(lons), min(lats), max(lons), max(lats)]
@@ -0,0 +1,116 @@
+import threading
+import time
+from sentence_transformers import SentenceTransformer
+
+from queries.LRUCache import LRUCache
+
+
+DEFAULT_MODEL_NAME = 'msmarco-distilbert-base-v4'
+
+# default size and lifetime (seconds) of the query embedding cache (can be set in the config)
+EMBEDDING_CACHE_SIZE = 4096
+EMBEDDING_CACHE_TTL = 24 * 3600
+
+
+
+class ModelRegistry:
+    # process-wide registry for SentenceTransformer models; every model is loaded only once and shared by all retrieval paths
+
+    def __init__(self, cache_size:int = EMBEDDING_CACHE_SIZE, cache_ttl:float = EMBEDDING_CACHE_TTL) -> None:
+        self.models = {}
+        self.stats = {}
+        self.lock = threading.Lock()
+        # cache for query embeddings (key: model name, normalize flag, normalized query text)
+        self.embedding_cache = LRUCache(maxsize=cache_size, ttl=cache_ttl)
+
+    def configure_cache(self, cache_size:int = EMBEDDING_CACHE_SIZE, cache_ttl:float = EMBEDDING_CACHE_TTL):
+        ''' Replaces the embedding cache with an empty cache of the given size and lifetime (seconds; None -> entries do not expire) '''
+        self.embedding_cache = LRUCache(maxsize=cache_size, ttl=cache_ttl)
+
+    def get_model(self, model_name:str = DEFAULT_MODEL_NAME) -> SentenceTransformer:
+        '''
+            Returns the model with the given name
+            The model is loaded from disk on first access and kept in memory for the lifetime of the process
+        '''
+        model = self.models.get(model_name)
+        if model is not None:
+            return model
+
+        with self.lock:
+            # check again; another thread could have loaded the model in the meantime
+            model = self.models.get(model_name)
+            if model is not None:
+                return model
+            start = time.perf_counter()
+            model = SentenceTransformer(model_name)
+            load_time = time.perf_counter() - start
+            print(f"ModelRegistry - loaded model {model_name} in {load_time:.2f}s")
+            self.stats[model_name] = {
+                'load_time': load_time,
+                'encode_count': 0,
+                'encode_time': 0.0,
+            }
+            self.models[model_name] = model
+        return model
+
+    def warm_up(self, model_names:list[str] = None):
+        '''
+            Loads all given models and runs a dummy encode, so that the first user request does not pay for loading and initialization
+        '''
+        if model_names is None:
+            model_names = [DEFAULT_MODEL_NAME]
+        for model_name in model_names:
+            try:
+                self.encode("warm up", model_name=model_name)
+            except Exception as e:
+                print(e)
+                print(f"error - could not warm up model {model_name}")
+
+    def encode(self, text:str, model_name:str = DEFAULT_MODEL_NAME, normalize:bool = False):
+        '''
+            Encodes the text with the given model and records the encode latency
+            normalize: returns a unit-normalized embedding (stored embeddings are normalized as well -> cosine similarity is the dot product)
+            Embeddings of repeated queries are served from the embedding cache
+            Returns the embedding as (read-only) numpy array
+        '''
+        cache_key = (model_name, normalize, normalize_query_text(text))
+        embedding = self.embedding_cache.get(cache_key)
+        if embedding is not None:
+            return embedding
+
+        model = self.get_model(model_name)
+        start = time.perf_counter()
+        embedding = model.encode(text, normalize_embeddings=normalize)
+        encode_time = time.perf_counter() - start
+        with self.lock:
+            model_stats = self.stats[model_name]
+            model_stats['encode_count'] += 1
+            model_stats['encode_time'] += encode_time
+        print(f"ModelRegistry - encoded query with {model_name} in {encode_time*1000:.1f}ms")
+
+        # cached embeddings are shared between requests
+        embedding.setflags(write=False)
+        self.embedding_cache.set(cache_key, embedding)
+        return embedding
+
+    def get_stats(self) -> dict:
+        ''' Returns load time and average encode latency for every loaded model '''
+        with self.lock:
+            stats = {}
+            for model_name, model_stats in self.stats.items():
+                encode_count = model_stats['encode_count']
+                stats[model_name] = {
+                    'load_time': model_stats['load_time'],
+                    'encode_count': encode_count,
+                    'avg_encode_time': model_stats['encode_time'] / encode_count if encode_count else None,
+                }
+        return stats
+
+
+def normalize_query_text(text:str) -> str:
+    # queries that only differ in case or whitespace share the same cache entry
+    return ' '.join(text.lower().split())
+
+
+# shared registry for the whole process
+model_registry = ModelRegistry()
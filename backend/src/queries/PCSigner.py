@@ -0,0 +1,114 @@
+import threading
+import time
+from urllib.parse import urlparse
+import planetary_computer
+from planetary_computer import sas
+from planetary_computer.settings import Settings
+from planetary_computer.utils import parse_blob_url
+
+
+# tokens are refreshed (in the background) if they expire within this interval (seconds)
+# should be larger than the lifetime of cached STAC items, so that cached signed links stay valid
+TOKEN_REFRESH_MARGIN = 1200
+
+# interval (seconds) between two checks of the background refresh thread
+TOKEN_CHECK_INTERVAL = 60
+
+# tokens of containers that were not used for this interval (seconds) are not refreshed anymore
+TOKEN_IDLE_TIMEOUT = 24 * 3600
+
+# storage account of public assets (e.g. thumbnails) that do not need a token
+PUBLIC_ASSETS_ACCOUNT = "ai4edatasetspublicassets"
+
+
+
+class PCSigner:
+    # signs Planetary Computer assets with planetary_computer.sign_inplace (token cache and retries of planetary_computer.sas)
+    # additionally refreshes the tokens of recently used containers in the background before they expire
+    # -> signing search results does not need a network round-trip (except for the first request on a container)
+
+    def __init__(self, refresh_margin:float = TOKEN_REFRESH_MARGIN, check_interval:float = TOKEN_CHECK_INTERVAL,
+                 idle_timeout:float = TOKEN_IDLE_TIMEOUT) -> None:
+        self.refresh_margin = refresh_margin
+        self.check_interval = check_interval
+        self.idle_timeout = idle_timeout
+        self.last_used = {} # (account, container) -> timestamp of last use
+        self.refreshes = 0
+        self.refresh_thread = None
+        self.stop_event = threading.Event()
+
+    def start(self):
+        ''' Starts the background thread that refreshes the tokens of recently used containers before they expire '''
+        if self.refresh_thread is not None:
+            return
+        self.refresh_thread = threading.Thread(target=self.__refresh_loop, daemon=True)
+        self.refresh_thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def sign(self, obj):
+        '''
+            Signs the STAC object in place with planetary_computer.sign_inplace and records the containers of its assets
+            Can be used as modifier of pystac_client
+        '''
+        obj = planetary_computer.sign_inplace(obj)
+        now = time.monotonic()
+        for href in _get_asset_hrefs(obj):
+            parsed_url = urlparse(href)
+            if not parsed_url.netloc.endswith(sas.BLOB_STORAGE_DOMAIN):
+                continue
+            try:
+                account, container = parse_blob_url(parsed_url)
+            except ValueError:
+                continue
+            if account != PUBLIC_ASSETS_ACCOUNT:
+                self.last_used[(account, container)] = now
+        return obj
+
+    def get_stats(self) -> dict:
+        tokens = list(sas.TOKEN_CACHE.values())
+        return {
+            'tokens': len(tokens),
+            'containers': len(self.last_used),
+            'refreshes': self.refreshes,
+            'min_ttl': min([token.ttl() for token in tokens], default=None),
+        }
+
+    def __refresh_loop(self):
+        while not self.stop_event.wait(self.check_interval):
+            now = time.monotonic()
+            sas_url = Settings.get().sas_url
+            for key, last_used in list(self.last_used.items()):
+                if now - last_used > self.idle_timeout:
+                    # container is not used anymore
+                    self.last_used.pop(key, None)
+                    continue
+                account, container = key
+                token_request_url = f"{sas_url}/{account}/{container}"
+                token = sas.TOKEN_CACHE.get(token_request_url)
+                if token is not None and token.ttl() > self.refresh_margin:
+                    continue
+                try:
+                    # get_token only fetches a new token if the cached one expires within a minute -> cached token is dropped first
+                    sas.TOKEN_CACHE.pop(token_request_url, None)
+                    sas.get_token(account, container)
+                    self.refreshes += 1
+                except Exception as e:
+                    if token is not None:
+                        sas.TOKEN_CACHE.setdefault(token_request_url, token)
+                    print(e)
+                    print(f"error - could not refresh SAS token for {account}/{container}")
+
+
+def _get_asset_hrefs(obj) -> list[str]:
+    # hrefs of the assets of item/collection/item collection dictionaries or pystac objects
+    if isinstance(obj, dict):
+        if obj.get('type') == 'FeatureCollection':
+            return [asset.get('href', '') for feature in obj.get('features', []) for asset in feature.get('assets', {}).values()]
+        return [asset.get('href', '') for asset in obj.get('assets', {}).values()]
+    if hasattr(obj, 'assets'):
+        return [asset.href for asset in obj.assets.values()]
+    if hasattr(obj, 'items'):
+        return [asset.href for item in obj.items for asset in item.assets.values()]
+    return []
@@ -5,14 +5,37 @@ import parsedatetime as pdt
 from datetime import datetime, timedelta
 from pytz import timezone
 
+from queries.GeocodeCache import GeocodeCache, GEOCODE_CACHE_PATH, GEOCODE_TTL, GEOCODE_NEGATIVE_TTL, GEOCODE_FRESH, GEOCODE_STALE
+from queries.Gazetteer import Gazetteer
+
 
 class QueryAnalyzer:
     # this class is used to parse geolocations and other attributes from a user query
 
-    def __init__(self, geonames_username:str):
+    def __init__(self, geonames_username:str, geocode_cache_config:dict = None, gazetteer_config:dict = None):
         self.nlp = spacy.load('en_core_web_sm')
         self.stopwords = self.nlp.Defaults.stop_words
         self.username = geonames_username
+        # persistent cache for geonames results (place name -> bbox)
+        geocode_cache_config = geocode_cache_config or {}
+        self.geocode_cache = GeocodeCache(
+            path=geocode_cache_config.get('path', GEOCODE_CACHE_PATH), 
+            ttl=geocode_cache_config.get('ttl', GEOCODE_TTL), 
+            negative_ttl=geocode_cache_config.get('negative_ttl', GEOCODE_NEGATIVE_TTL), 
+        )
+        # offline gazetteer (GeoNames dump); geonames.org is only requested as fallback (if enabled)
+        gazetteer_config = gazetteer_config or {}
+        self.gazetteer = None
+        self.remote_fallback = gazetteer_config.get('remote_fallback', True)
+        if gazetteer_config.get('index_path'):
+            # only an existing index is loaded; it is built with the build command of queries/Gazetteer.py
+            try:
+                self.gazetteer = Gazetteer(gazetteer_config['index_path'])
+                print(f"loaded gazetteer with {len(self.gazetteer)} places")
+            except Exception as e:
+                print(e)
+                print(f"error - could not load gazetteer index {gazetteer_config['index_path']}; using geonames.org for location resolution")
+                self.remote_fallback = True
 
     def analyze_query(self, user_query:str):
         ''' 
@@ -112,8 +135,43 @@ class QueryAnalyzer:
     
 
     def __get_bbox_from_location(self, location:str):
+        '''
+            Returns the bbox of the location from the gazetteer (no network); if the gazetteer is not configured or does not know the location
+            and remote fallback is enabled, the bbox is resolved with the geocode cache / geonames
+        '''
+        if self.gazetteer is not None:
+            match = self.gazetteer.lookup(location)
+            if match is not None:
+                return match['bbox']
+            if not self.remote_fallback:
+                return None
+        return self.__get_bbox_from_geonames(location)
+
+    def __get_bbox_from_geonames(self, location:str):
+        '''
+            Returns the bbox of the location from the geocode cache; geonames is only requested if the location is not cached (or expired)
+            Misses are cached as well; failing requests are not cached (expired entry is used instead if available)
+        '''
+        status, bbox = self.geocode_cache.lookup(location)
+        if status == GEOCODE_FRESH:
+            return bbox
+        try:
+            bbox = self.__fetch_bbox_from_geonames(location)
+        except ConnectionError as e:
+            print(e)
+            print(f"error - geonames request failed for location {location}")
+            if status == GEOCODE_STALE:
+                return bbox
+            return None
+        self.geocode_cache.set(location, bbox)
+        return bbox
+
+    def __fetch_bbox_from_geonames(self, location:str):
         # first request fetches geonames id (using best single match)
         g = geocoder.geonames(location, key=self.username)
+        if g.error:
+            # request failed (e.g. connection error, rate limit) -> result must not be cached
+            raise ConnectionError(g.error)
         if g.geonames_id is None:
             print(f"error - geonames did not find any result for loaction {location}!")
             return None
@@ -121,6 +179,8 @@ class QueryAnalyzer:
         # second call fetches details (-> bbox)
         # https://geocoder.readthedocs.io/providers/GeoNames.html
         details = geocoder.geonames(g.geonames_id, method='details', key=self.username)
+        if details.error:
+            raise ConnectionError(details.error)
         try:
             # TODO extract more data from details object? 
             # extracts coordinates from details.bbox attribute
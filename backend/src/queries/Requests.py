@@ -1,4 +1,4 @@
-from pydantic import BaseModel, StrictFloat, PositiveInt
+from pydantic import BaseModel, StrictFloat, PositiveInt, NonNegativeInt
 from typing import Dict, List, Tuple
 from datetime import datetime
 
@@ -7,6 +7,7 @@ class STACCollectionRequest(BaseModel):
     query: str
     keywords: list[str]
     limit: PositiveInt
+    offset: NonNegativeInt = 0
     location_filter: object | None = None
 
 class WebRequest(BaseModel):
@@ -18,12 +19,26 @@ class PubRequest(BaseModel):
     query: str
     keywords: list[str]
     limit: PositiveInt
+    offset: NonNegativeInt = 0
+    semantic: bool = False
 
 class STACItemRequest(BaseModel):
     collection_id: str
     limit: PositiveInt
     location_filter: object | None = None
     time_interval: List[object]
+    compact: bool = False
+
+class STACItemBatchRequest(BaseModel):
+    collection_ids: list[str]
+    limit: PositiveInt
+    location_filter: object | None = None
+    time_interval: List[object]
+    compact: bool = False
+
+class STACItemDetailRequest(BaseModel):
+    collection_id: str
+    item_id: str
 
 class QueryAnalyzerRequest(BaseModel):
     query :str
@@ -33,9 +48,15 @@ class NotebookExportRequest(BaseModel):
     location_filter: object | None = None
     time_interval: List[object]
 
+class NotebookBulkExportRequest(BaseModel):
+    exports: list[NotebookExportRequest]
+
 class GeotweetRequest(BaseModel):
     only_floods: bool
     limit: PositiveInt
+    offset: NonNegativeInt = 0
+    location_filter: object | None = None
+    time_interval: List[object] | None = None
 
 
 class GraphQueryRequest(BaseModel):
@@ -0,0 +1,84 @@
+import json
+
+from queries.LRUCache import LRUCache
+from queries.LonLatGrid import LonLatGrid
+
+
+# tile sizes (degrees) of the zoom levels; a request uses the smallest tiles that cover its bbox with at most MAX_TILES tiles
+# -> views from city (~0.5 deg) to country/region scale (~30 deg) are served from the cache
+TILE_SIZES = [0.25, 1.0, 4.0, 16.0]
+
+# requests that cover more tiles on the largest level are not cached (e.g. continents, the whole world)
+MAX_TILES = 9
+
+# tile status
+TILE_COMPLETE = 'complete' # tile holds all items of its search
+TILE_INCOMPLETE = 'incomplete' # search of the tile hit the fetch limit -> items of the tile are not known (not stored)
+TILE_MISSING = 'missing'
+
+
+
+class STACItemCache:
+    # cache for STAC item search results; keyed on collection, tile (zoom level + cell of its lon/lat grid), time interval and projection (compact/full)
+    # overlapping map views (panning/zooming) reuse the tiles of previous requests and only fetch missing tiles upstream
+    # only complete tiles (fewer items than the fetch limit) can be used; results of dense tiles would be cut off
+
+    def __init__(self, max_bytes:int = 256*1024*1024, ttl:float = 900, tile_sizes:list[float] = TILE_SIZES, max_tiles:int = MAX_TILES) -> None:
+        self.grids = [LonLatGrid(tile_size) for tile_size in sorted(tile_sizes)]
+        self.max_tiles = max_tiles
+        # value: (fetch limit, list of item dictionaries (None if the tile is incomplete))
+        self.cache = LRUCache(maxsize=100000, ttl=ttl, maxbytes=max_bytes, sizeof=self.__sizeof)
+
+    def get_tiles(self, bbox:list) -> list[tuple[int, int, int]]:
+        '''
+            Returns the tiles (level, x, y) that cover the bbox (W,S,E,N); uses the smallest tile size with at most max_tiles tiles
+            Returns None if the bbox covers too many tiles to be cached
+        '''
+        for level, grid in enumerate(self.grids):
+            x_min, y_min, x_max, y_max = grid.cell_range(bbox)
+            if (x_max - x_min + 1) * (y_max - y_min + 1) <= self.max_tiles:
+                return [(level, x, y) for x in range(x_min, x_max + 1) for y in range(y_min, y_max + 1)]
+        return None
+
+    def get_tile_bbox(self, tile:tuple[int, int, int]) -> list[float]:
+        ''' Returns the bbox (W,S,E,N) of the tile '''
+        level, x, y = tile
+        return self.grids[level].cell_bbox(x, y)
+
+    def get(self, collection_id:str, tile:tuple[int, int, int], time_interval:list, limit:int, compact:bool = False) -> tuple[str, list[dict]]:
+        '''
+            Returns (status, items) of the tile; items are only returned for complete tiles
+            status: TILE_COMPLETE, TILE_INCOMPLETE or TILE_MISSING (not cached or incomplete with a smaller fetch limit than limit)
+        '''
+        entry = self.cache.get(self.__get_key(collection_id, tile, time_interval, compact))
+        if entry is None:
+            return TILE_MISSING, None
+        fetch_limit, items = entry
+        if items is not None:
+            return TILE_COMPLETE, items
+        if fetch_limit < limit:
+            # a search with the larger limit might be complete
+            return TILE_MISSING, None
+        return TILE_INCOMPLETE, None
+
+    def set(self, collection_id:str, tile:tuple[int, int, int], time_interval:list, fetch_limit:int, items:list[dict], compact:bool = False) -> str:
+        '''
+            Stores the items of the tile search (fetched with max_items = fetch_limit); returns the status of the tile
+        '''
+        if len(items) >= fetch_limit:
+            self.cache.set(self.__get_key(collection_id, tile, time_interval, compact), (fetch_limit, None))
+            return TILE_INCOMPLETE
+        self.cache.set(self.__get_key(collection_id, tile, time_interval, compact), (fetch_limit, items))
+        return TILE_COMPLETE
+
+    def get_stats(self) -> dict:
+        return self.cache.get_stats()
+
+    def __get_key(self, collection_id:str, tile:tuple[int, int, int], time_interval:list, compact:bool) -> tuple:
+        # compact and full items are cached separately
+        time_key = tuple(str(t) for t in time_interval) if time_interval else None
+        return (collection_id, tile, time_key, compact)
+
+    def __sizeof(self, entry:tuple) -> int:
+        # estimated memory usage (size of JSON representation)
+        return len(json.dumps(entry[1])) if entry[1] is not None else 0
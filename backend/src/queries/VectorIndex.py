@@ -0,0 +1,202 @@
+import numpy as np
+
+
+
+class VectorIndex:
+    # in-process index for cosine similarity search; embeddings are stored as pre-normalized float32 matrix
+
+    def __init__(self, ids:list[str], embeddings:list[list[float]]) -> None:
+        self.ids = np.asarray(ids, dtype=object)
+        if not ids:
+            self.matrix = np.zeros((0, 0), dtype=np.float32)
+            return
+        self.matrix = _normalize_rows(np.asarray(embeddings, dtype=np.float32))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def search(self, query_embedding, limit:int, sim_threshold:float = None, mask = None) -> list[tuple[str, float]]:
+        '''
+            Computes cosine similarity of the query embedding to all stored embeddings (one matrix-vector product)
+            mask: optional boolean array over the stored embeddings; only these candidates are scored (e.g. result of a spatial filter)
+            Returns the top-k (id, score) tuples sorted by descending similarity
+        '''
+        if len(self) == 0 or limit <= 0:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query_norm = np.linalg.norm(query)
+        if query_norm == 0:
+            return []
+        if mask is not None:
+            rows = np.flatnonzero(mask)
+            scores = self.matrix[rows] @ (query / query_norm)
+        else:
+            rows = None
+            scores = self.matrix @ (query / query_norm)
+        if len(scores) == 0:
+            return []
+
+        if limit < len(scores):
+            # only sort the top-k candidates
+            top_idx = np.argpartition(-scores, limit - 1)[:limit]
+        else:
+            top_idx = np.arange(len(scores))
+        top_idx = top_idx[np.argsort(-scores[top_idx], kind='stable')]
+
+        if sim_threshold is not None:
+            top_idx = top_idx[scores[top_idx] >= sim_threshold]
+        if rows is not None:
+            return [(self.ids[rows[i]], float(scores[i])) for i in top_idx]
+        return [(self.ids[i], float(scores[i])) for i in top_idx]
+
+
+def collect_embeddings(nodes) -> tuple[list[str], list[list[float]]]:
+    '''
+        Collects ID's and embeddings from an iterable of {id, embedding} dictionaries
+        Nodes without embedding (or with unexpected dimension) are skipped
+    '''
+    ids = []
+    embeddings = []
+    dim = None
+    for node in nodes:
+        embedding = node.get('embedding')
+        if not embedding:
+            continue
+        if dim is None:
+            dim = len(embedding)
+        if len(embedding) != dim:
+            print(f"warning - skipping embedding of node {node.get('id')} (dimension {len(embedding)} != {dim})")
+            continue
+        ids.append(node['id'])
+        embeddings.append(embedding)
+    return ids, embeddings
+
+
+def build_vector_index(nodes) -> VectorIndex:
+    ''' Builds a VectorIndex from an iterable of {id, embedding} dictionaries '''
+    ids, embeddings = collect_embeddings(nodes)
+    return VectorIndex(ids, embeddings)
+
+
+
+class IVFIndex:
+    # approximate nearest neighbour index (IVF-flat) for cosine similarity search
+    # embeddings are clustered with (spherical) k-means; a query only scans the members of the nprobe closest clusters
+
+    def __init__(self, ids, matrix, centroids, offsets, nprobe:int = 8, revision:str = None) -> None:
+        # rows of matrix (and ids) are sorted by cluster; members of cluster c are stored in rows offsets[c]:offsets[c+1]
+        self.ids = np.asarray(ids, dtype=object)
+        self.matrix = matrix
+        self.centroids = centroids
+        self.offsets = offsets
+        self.nprobe = nprobe
+        self.revision = revision
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, ids:list[str], embeddings:list[list[float]], nlist:int = 256, nprobe:int = 8, 
+              train_iterations:int = 10, train_size:int = 100000, revision:str = None, seed:int = 0):
+        '''
+            Builds the index: trains nlist centroids with k-means on (a sample of) the embeddings and assigns every embedding to its closest centroid
+            nlist/nprobe control the recall/latency trade-off (more probed clusters -> higher recall, slower queries)
+        '''
+        matrix = _normalize_rows(np.asarray(embeddings, dtype=np.float32))
+        nlist = max(1, min(nlist, len(matrix)))
+        rng = np.random.default_rng(seed)
+
+        # train centroids on a sample
+        sample = matrix
+        if len(matrix) > train_size:
+            sample = matrix[rng.choice(len(matrix), train_size, replace=False)]
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(train_iterations):
+            assignments = _assign_clusters(sample, centroids)
+            counts = np.bincount(assignments, minlength=nlist)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            empty = counts == 0
+            if empty.any():
+                # re-seed empty clusters with random samples
+                sums[empty] = sample[rng.choice(len(sample), int(empty.sum()), replace=False)]
+            centroids = _normalize_rows(sums)
+
+        # sort all embeddings by cluster
+        assignments = _assign_clusters(matrix, centroids)
+        order = np.argsort(assignments, kind='stable')
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(assignments, minlength=nlist))
+        ids = np.asarray(ids, dtype=object)[order]
+        return cls(ids, matrix[order], centroids, offsets, nprobe=nprobe, revision=revision)
+
+    def search(self, query_embedding, limit:int, sim_threshold:float = None, nprobe:int = None) -> list[tuple[str, float]]:
+        '''
+            Returns the (approximate) top-k (id, score) tuples sorted by descending cosine similarity
+        '''
+        if len(self) == 0 or limit <= 0:
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query_norm = np.linalg.norm(query)
+        if query_norm == 0:
+            return []
+        query = query / query_norm
+
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        centroid_scores = self.centroids @ query
+        probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        rows = np.concatenate([np.arange(self.offsets[c], self.offsets[c+1]) for c in probe])
+        if len(rows) == 0:
+            return []
+
+        scores = self.matrix[rows] @ query
+        if limit < len(scores):
+            top_idx = np.argpartition(-scores, limit - 1)[:limit]
+        else:
+            top_idx = np.arange(len(scores))
+        top_idx = top_idx[np.argsort(-scores[top_idx], kind='stable')]
+        if sim_threshold is not None:
+            top_idx = top_idx[scores[top_idx] >= sim_threshold]
+        return [(self.ids[rows[i]], float(scores[i])) for i in top_idx]
+
+    def save(self, path:str):
+        ''' Persists the index as (uncompressed) numpy archive '''
+        with open(path, 'wb') as file:
+            np.savez(
+                file, 
+                ids=self.ids.astype(str), 
+                matrix=self.matrix, 
+                centroids=self.centroids, 
+                offsets=self.offsets, 
+                revision=np.array(self.revision or ''), 
+            )
+
+    @classmethod
+    def load(cls, path:str, nprobe:int = 8):
+        ''' Loads an index that was persisted with save() '''
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                ids=data['ids'].tolist(), 
+                matrix=data['matrix'], 
+                centroids=data['centroids'], 
+                offsets=data['offsets'], 
+                nprobe=nprobe, 
+                revision=str(data['revision']) or None, 
+            )
+
+
+def _normalize_rows(matrix):
+    # avoid division by zero for empty embeddings (similarity will be 0)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _assign_clusters(matrix, centroids, chunk_size:int = 10000):
+    # assigns every row to its closest centroid (computed in chunks to bound memory)
+    assignments = np.empty(len(matrix), dtype=np.int64)
+    for start in range(0, len(matrix), chunk_size):
+        chunk = matrix[start:start+chunk_size]
+        assignments[start:start+chunk_size] = np.argmax(chunk @ centroids.T, axis=1)
+    return assignments
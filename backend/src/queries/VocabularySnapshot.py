@@ -0,0 +1,64 @@
+import json
+import gzip
+import hashlib
+import threading
+import time
+from pyArango.connection import DBHandle
+
+
+
+class VocabularySnapshot:
+    # in-memory snapshot of a vocabulary (e.g. all keywords) as pre-serialized and pre-compressed JSON
+    # the snapshot is keyed by the revisions of the underlying collections and refreshed when they change
+
+    def __init__(self, name:str, db_instance:DBHandle, collections:list[str], loader, check_interval:float = 30) -> None:
+        self.name = name
+        self.db = db_instance
+        self.collections = collections
+        self.loader = loader # function that returns the vocabulary as list
+        self.check_interval = check_interval # minimum number of seconds between two revision checks
+        self.lock = threading.Lock()
+        self.version = None
+        self.etag = None
+        self.body = b'[]'
+        self.gzip_body = gzip.compress(self.body, mtime=0)
+        self.last_check = None
+
+    def get(self) -> tuple[str, bytes, bytes]:
+        '''
+            Returns (etag, body, gzip compressed body) of the current snapshot
+            Checks the collection revisions at most every check_interval seconds and reloads the vocabulary if they changed
+        '''
+        if self.__check_due():
+            self.refresh()
+        return self.etag, self.body, self.gzip_body
+
+    def refresh(self, force:bool = False):
+        with self.lock:
+            if not force and not self.__check_due():
+                # another thread refreshed the snapshot in the meantime
+                return
+            self.last_check = time.monotonic()
+            try:
+                version = '-'.join(str(self.db[collection].revision()) for collection in self.collections)
+            except Exception as e:
+                print(e)
+                print(f"error - could not fetch revision for {self.name} snapshot")
+                return
+            if not force and version == self.version:
+                return
+
+            start = time.perf_counter()
+            vocabulary = self.loader()
+            if not vocabulary:
+                # do not pin an empty snapshot to this version (loader returns empty list on errors) -> try again on next check
+                print(f"warning - {self.name} snapshot is empty")
+                version = None
+            self.body = json.dumps(vocabulary, separators=(',', ':')).encode('utf-8')
+            self.gzip_body = gzip.compress(self.body, mtime=0)
+            self.etag = '"' + hashlib.sha1(self.body).hexdigest() + '"'
+            self.version = version
+            print(f"VocabularySnapshot - refreshed {self.name} snapshot ({len(vocabulary)} entries, {len(self.gzip_body)} bytes compressed) in {time.perf_counter()-start:.2f}s")
+
+    def __check_due(self) -> bool:
+        return self.last_check is None or time.monotonic() - self.last_check >= self.check_interval
@@ -0,0 +1,307 @@
+import json
+import asyncio
+import uuid
+import geojson
+import httpx
+
+from utils import normalize_scoring_range
+from queries.LRUCache import LRUCache
+
+
+CHATNOIR_ENDPOINT = 'https://chatnoir.web.webis.de/api/v1/_search'
+PROTOTYPE_WEBINDEX_ENDPOINT = 'https://qnode.eu/ows/prosa/service/'
+MOSAIC_ENDPOINT = 'https://qnode.eu/ows/mosaic/service/'
+
+DEMO_INDEX_MOSAIC = "dlrprototype"
+DEMO_INDEX_STANDARD = "demo-dlrsciencesearch"
+
+# sources that are queried in federated mode
+FEDERATED_WEB_SOURCES = ['chatnoir', 'prototype_webindex', 'mosaic']
+
+# timeout (seconds) for a single request on the web index
+DEFAULT_WEB_TIMEOUTS = {
+    'chatnoir': 10.0,
+    'prototype_webindex': 10.0,
+    'mosaic': 10.0,
+}
+
+# lifetime (seconds) of cached web query results per source
+DEFAULT_WEB_CACHE_TTLS = {
+    'chatnoir': 3600.0,
+    'prototype_webindex': 600.0,
+    'mosaic': 600.0,
+}
+
+# grid size (degrees) for rounding the bbox of cache keys
+BBOX_CACHE_GRID = 0.01
+
+
+class WebSearchClient:
+    # async client for the external web indexes (chatnoir, prototype webindex, mosaic)
+    # uses one pooled http client (keep-alive connections) for all requests
+
+    def __init__(self, web_api_key:str, timeouts:dict = None, max_connections:int = 100, cache_ttls:dict = None, cache_size:int = 1024) -> None:
+        self.api_key = web_api_key
+        self.timeouts = {**DEFAULT_WEB_TIMEOUTS, **(timeouts or {})}
+        # cache for web query results (key: source, query, limit, bbox rounded to grid)
+        self.cache_ttls = {**DEFAULT_WEB_CACHE_TTLS, **(cache_ttls or {})}
+        self.cache = LRUCache(maxsize=cache_size)
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=20),
+        )
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def search(self, index_source:str, query:str, limit:int, bbox:list = None, verbose:bool = False) -> list[dict]:
+        '''
+            Makes web query on the given source (chatnoir, prototype_webindex or mosaic)
+            bbox (S,W,N,E) is only supported by mosaic
+            Results of repeated queries are served from the result cache (without network call)
+        '''
+        cache_key = self.__get_cache_key(index_source, query, limit, bbox)
+        results = self.cache.get(cache_key)
+        if results is not None:
+            if verbose:
+                print(f"web query on {index_source} served from cache")
+            return results
+
+        try:
+            if index_source == "chatnoir":
+                results = await self.__search_chatnoir(query=query, limit=limit, verbose=verbose)
+            elif index_source == "prototype_webindex":
+                results = await self.__search_prototype_webindex(query=query, limit=limit, verbose=verbose)
+            elif index_source == "mosaic":
+                results = await self.__search_mosaic_webindex(query=query, limit=limit, bbox=bbox, verbose=verbose)
+            if results:
+                # empty results are not cached (could be caused by a failing web index)
+                self.cache.set(cache_key, results, ttl=self.cache_ttls.get(index_source))
+            if results is not None:
+                return results
+        except httpx.TimeoutException:
+            print(f"error - web query on {index_source} timed out after {self.timeouts.get(index_source)}s")
+            return []
+        except httpx.HTTPError as e:
+            print(e)
+            print(f"error - web query on {index_source} failed")
+            return []
+        print(f"error - invalid state! did not find web index source for {index_source}")
+        return None
+
+    async def federated_search(self, query:str, limit:int, bbox:list = None, sources:list[str] = FEDERATED_WEB_SOURCES, 
+                               deadline:float = 8.0, verbose:bool = False) -> list[dict]:
+        '''
+            Fans the query out concurrently to all given sources and returns whatever arrived before the (global) deadline
+            Scores are normalized per source, results are deduplicated by URL and ranked by score
+        '''
+        tasks = {
+            asyncio.create_task(self.search(source, query=query, limit=limit, bbox=bbox, verbose=verbose)): source 
+            for source in sources
+        }
+        done, pending = await asyncio.wait(tasks.keys(), timeout=deadline)
+        for task in pending:
+            print(f"warning - web query on {tasks[task]} did not finish within {deadline}s")
+            task.cancel()
+
+        results_by_url = {}
+        for task in done:
+            source = tasks[task]
+            try:
+                results = task.result() or []
+            except Exception as e:
+                print(e)
+                print(f"error - web query on {source} failed")
+                continue
+            if not results:
+                continue
+            # results can be shared with the result cache -> do not modify them in place
+            results = [dict(result) for result in results]
+            # scores of different sources are not comparable -> normalize each source to [0,1]
+            min_score = min([result['score'] for result in results])
+            max_score = max([result['score'] for result in results])
+            results = normalize_scoring_range(results, min_score, max_score)
+            for result in results:
+                result['source'] = source
+                url = result['url']
+                if url in results_by_url and results_by_url[url]['score'] >= result['score']:
+                    continue
+                results_by_url[url] = result
+
+        merged_results = sorted(results_by_url.values(), key=lambda result: result['score'], reverse=True)
+        if verbose:
+            print(f"federated web query - {len(done)}/{len(sources)} sources answered in time, {len(merged_results)} unique results")
+        return merged_results[:limit]
+
+    async def __search_chatnoir(self, query:str, limit:int = 100, verbose:bool = False) -> list[dict]:
+        body = {
+            'apikey': self.api_key,
+            'query': query,
+            'index': ['cw12'], # TODO use other indices as well?
+            'size': limit,
+            'pretty': True,
+        }
+        response = await self.client.post(CHATNOIR_ENDPOINT, json=body, timeout=self.timeouts['chatnoir'])
+        try:
+            if response.status_code > 500 and response.status_code < 600:
+                # SERVER ERROR
+                print(f"Server error (Chatnoir) - status code {response.status_code}")
+                response_dict = {}
+            else:
+                response_dict = json.loads(response.text)
+        except Exception as e:
+            print(f"Exception in parsing response - {e}")
+            print(f"Status code: {response.status_code}")
+            response_dict = {}
+
+        meta = response_dict.get('meta', {})
+        results = response_dict.get('results', [])
+
+        if verbose and meta:
+            print(f"query time: {meta.get('query_time')}, total results: {meta.get('total_results')}")
+
+        # normalize score
+        # TODO find better (safer) way
+        if results:
+            min_score = min([result['score'] for result in results])
+            max_score = max([result['score'] for result in results])
+            results = normalize_scoring_range(results, min_score, max_score)
+
+        # transform results to fit standardized interface
+        transformed_results = []
+        for result in results:
+            title = result.get('title', '')
+            url = result.get('target_uri', '')
+            text = result.get('snippet', '')
+            transformed_results.append({
+                'id': uuid.uuid4(),
+                'title': title,
+                'url': url,
+                'text': text,
+                'is_html': True,
+                'locations': [],
+                'score': result['score'],
+            })
+        return transformed_results
+
+    async def __search_prototype_webindex(self, query:str, limit:int = 100, verbose:bool = False) -> list[dict]:
+        params = {
+            'q': query,
+            'index': DEMO_INDEX_STANDARD,
+            'limit': limit,
+        }
+        if verbose:
+            print(f"making request on url: {PROTOTYPE_WEBINDEX_ENDPOINT}search with params {params}")
+
+        response = await self.client.get(f"{PROTOTYPE_WEBINDEX_ENDPOINT}search", params=params, timeout=self.timeouts['prototype_webindex'])
+        try:
+            response_dict = json.loads(response.text)
+        except Exception as e:
+            print(f"Exception in parsing response - {e}")
+            print(f"Status code: {response.status_code}")
+            response_dict = {}
+
+        results = response_dict.get('results', [])
+
+        # transform results to fit standardized interface
+        transformed_results = []
+        for rank, result in enumerate(results):
+            title = result.get('title', '')
+            url = result.get('url', '')
+            text = result.get('textSnippet', '')
+            transformed_results.append({
+                'id': uuid.uuid4(),
+                'title': title,
+                'url': url,
+                'text': text,
+                'is_html': False,
+                'locations': [],
+                'score': self.__get_score(result, rank, len(results)),
+            })
+        return transformed_results
+
+    async def __search_mosaic_webindex(self, query:str, limit:int = 1000, bbox:list = None, verbose:bool = False) -> list[dict]:
+        params = {
+            'q': query,
+            'index': DEMO_INDEX_MOSAIC,
+            'limit': limit,
+        }
+        if bbox:
+            # bbox is S,W,N,E
+            params.update({
+                'east': bbox[3],
+                'west': bbox[1],
+                'north': bbox[2],
+                'south': bbox[0],
+            })
+        if verbose:
+            print(f"making request on url: {MOSAIC_ENDPOINT}search with params {params}")
+        response = await self.client.get(f"{MOSAIC_ENDPOINT}search", params=params, timeout=self.timeouts['mosaic'])
+        try:
+            response_dict = json.loads(response.text)
+        except Exception as e:
+            print(f"Exception in parsing response - {e}")
+            print(f"Status code: {response.status_code}")
+            response_dict = {}
+
+        results = response_dict.get('results', [])
+        if not results:
+            return []
+
+        results = results[0]['dlrprototype']
+
+        # transform results to fit standardized interface
+        transformed_results = []
+        for rank, result in enumerate(results):
+            title = result.get('title', '')
+            url = result.get('url', '')
+            text = result.get('textSnippet', '')
+            locations = result.get('locations', [])
+            locations = self.__transform_locations_from_web_query(locations)
+            transformed_results.append({
+                'id': uuid.uuid4(),
+                'title': title,
+                'url': url,
+                'text': text,
+                'is_html': False,
+                'locations': locations,
+                'score': self.__get_score(result, rank, len(results)),
+            })
+        return transformed_results
+
+    def __get_cache_key(self, index_source:str, query:str, limit:int, bbox:list = None) -> tuple:
+        # bbox is only used by mosaic; rounded to a grid so that nearly identical map views share the same entry
+        if index_source != "mosaic" or not bbox:
+            bbox = None
+        else:
+            bbox = tuple(round(coord / BBOX_CACHE_GRID) for coord in bbox)
+        return (index_source, ' '.join(query.lower().split()), limit, bbox)
+
+    def __get_score(self, result:dict, rank:int, num_results:int) -> float:
+        # uses the score of the web index if available, otherwise the score is derived from the rank
+        score = result.get('score')
+        if isinstance(score, (int, float)):
+            return score
+        return 1 - rank / num_results
+
+    def __transform_locations_from_web_query(self, raw_locations_list):
+        locations = []
+        # for now, only the first location is parsed, rest is discarded
+        for location in raw_locations_list:
+            loc_name = location.get('locationName')
+            loc_entries = location.get('locationEntries', [])
+            points = []
+            if len(loc_entries) > 1:
+                print(loc_entries)
+            for entry in loc_entries:
+                lat = entry['latitude']
+                long = entry['longitude']
+                # TODO fetch other info (e.g. country code)
+                points.append((long, lat))
+            multipoint_geojson = geojson.MultiPoint(points)
+            location = {
+                'name': loc_name,
+                'geojson': multipoint_geojson
+            }
+            locations.append(location)
+            break
+        return locations
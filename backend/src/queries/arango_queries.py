@@ -3,12 +3,17 @@
 
 
 
-STAC_SOURCE_QUERY = """
+STAC_SOURCES_QUERY = """
 FOR stac_coll in STACCollection
-    FILTER stac_coll._key == @doc_id
+    FILTER stac_coll._key IN @doc_ids
     FOR v in 1..1 INBOUND stac_coll GRAPH @graph_name
         FILTER v._id LIKE "STACSource/%"
-        return v
+        RETURN {collection: stac_coll._key, source: v._key}
+"""
+
+STAC_COLLECTION_SOURCE_MAP_QUERY = """
+FOR e in STACSourceContains
+    RETURN {collection: PARSE_IDENTIFIER(e._to).key, source: PARSE_IDENTIFIER(e._from).key}
 """
 
 
@@ -57,10 +62,12 @@ FOR v in INBOUND keyword HasKeyword
 '''
 SIMPLE_PUB_ARANGOSEARCH_QUERY:
     query: keyword query
-    limit: maximum number of documents to return (not used currently)
+    offset: number of (ranked) documents to skip
+    limit: maximum number of documents to return
     sim_score: controls the strictness of the matching (high sim_score -> only nodes that really match the keyword query are returned) [0,1]
 
     Returns publication nodes that are similar to the query; uses arangosearch indexing (ngrams, levenshtein distance) for search
+    Authors, keywords and EO objects are only traversed for the requested page
 '''
 SIMPLE_PUB_ARANGOSEARCH_QUERY = """
 LET query = @query
@@ -83,6 +90,7 @@ LET pubs_fuzzy = (
         OR BOOST(PHRASE(v.title, phraseStructure, 'en_tokenizer'), 10)
         OR BOOST(PHRASE(v.abstract, phraseStructure, 'en_tokenizer'), 10)
         SORT BM25(v) DESC  
+        LIMIT @offset, @limit
         RETURN {pub:v, score: BM25(v)}
 )
 
@@ -160,7 +168,7 @@ FOR node in stac_fuzzy
 
 '''
 SIMPLE_STAC_EMB_QUERY:
-    query_embedding: list of floats (embedding) from SentenceTransformer model
+    query_embedding: list of floats (unit-normalized embedding) from SentenceTransformer model
     limit: maximum number of documents to return
     sim_threshold: threshold to cut of for cosine similarity
 
@@ -170,24 +178,13 @@ SIMPLE_STAC_EMB_QUERY:
 SIMPLE_STAC_EMB_QUERY = """
 LET query_emb = @query_embedding
 
-LET query_emb_size = (SQRT(SUM(
-    FOR k IN RANGE(0,768)
-        RETURN POW(TO_NUMBER(NTH(query_emb, k)), 2)
-)))
-
 LET stac_fuzzy = (
     FOR v in STACCollection
-        LET v_size = (SQRT(SUM(
-            FOR k IN RANGE(0,768)
-                RETURN POW(TO_NUMBER(NTH(v.text_embedding, k)), 2)
-        )))
-
-        LET numerator = (SUM(
-            FOR i in RANGE(0,768)
-                RETURN TO_NUMBER(NTH(query_emb, i)) * TO_NUMBER(NTH(v.text_embedding, i))
+        // embeddings are unit-normalized (query + stored documents) -> cosine similarity is the dot product
+        LET cos_sim = (SUM(
+            FOR i in RANGE(0, LENGTH(query_emb)-1)
+                RETURN query_emb[i] * TO_NUMBER(v.text_embedding[i])
         ))
-
-        LET cos_sim = (numerator)/(query_emb_size*v_size)
         FILTER cos_sim >= @sim_threshold
         SORT cos_sim DESC
         //LIMIT @limit 
@@ -212,44 +209,195 @@ FOR node in stac_fuzzy
     RETURN {stac:node.stac, score:node.score, eo_objects:conn_eo_objects, stac_source:stac_source, keywords:keywords}
 """
 
+'''
+GEO_STAC_EMB_QUERY:
+    geometry: GeoJSON geometry of the location filter
+    query_embedding: list of floats (unit-normalized embedding) from SentenceTransformer model
+    sim_threshold: threshold to cut of for cosine similarity
+
+    Same as SIMPLE_STAC_EMB_QUERY, but only STAC collections with intersecting extent (geo index on extent_geometry) are scored
+'''
+GEO_STAC_EMB_QUERY = """
+LET query_emb = @query_embedding
+
+LET stac_fuzzy = (
+    FOR v in STACCollection
+        FILTER GEO_INTERSECTS(@geometry, v.extent_geometry)
+        LET cos_sim = (SUM(
+            FOR i in RANGE(0, LENGTH(query_emb)-1)
+                RETURN query_emb[i] * TO_NUMBER(v.text_embedding[i])
+        ))
+        FILTER cos_sim >= @sim_threshold
+        SORT cos_sim DESC
+        RETURN {stac: v, score:cos_sim}
+)
+
+FOR node in stac_fuzzy 
+    LET conn_eo_objects = (
+        FOR v in OUTBOUND node.stac._id Mentions
+        RETURN {node: v}
+    )
+    LET stac_source = (
+        FOR v in INBOUND node.stac._id STACSourceContains
+        RETURN {name: v.name, link: v.href}
+    )
+    
+    LET keywords = (
+        FOR v in OUTBOUND node.stac._id HasKeyword 
+            RETURN {keyword: v}
+    )
+    
+    RETURN {stac:node.stac, score:node.score, eo_objects:conn_eo_objects, stac_source:stac_source, keywords:keywords}
+"""
+
+'''
+STAC_GEO_CANDIDATES_QUERY:
+    geometry: GeoJSON geometry of the location filter
+
+    Returns the ID's of all STAC collections with intersecting extent (uses the geo index on extent_geometry)
+'''
+STAC_GEO_CANDIDATES_QUERY = """
+FOR v in STACCollection
+    FILTER GEO_INTERSECTS(@geometry, v.extent_geometry)
+    RETURN v._id
+"""
+
+'''
+MISSING_EXTENT_GEOMETRY_QUERY:
+    Returns the STAC collections without extent geometry (databases that were initialized before extent geometries were derived)
+'''
+MISSING_EXTENT_GEOMETRY_QUERY = """
+FOR v in STACCollection
+    FILTER !HAS(v, "extent_geometry")
+    RETURN {_key: v._key, extent: v.extent}
+"""
+
+'''
+NORMALIZE_EMBEDDINGS_QUERY:
+    @collection: collection with text embeddings (STACCollection or Publication)
+
+    Stores unit-normalized text embeddings (and the original norm) for all nodes that are not normalized yet
+    -> embedding similarity queries reduce to a single dot product
+'''
+NORMALIZE_EMBEDDINGS_QUERY = """
+FOR v in @@collection
+    FILTER v.text_embedding != null AND v.embedding_normalized != true
+    LET norm = SQRT(SUM(
+        FOR x in v.text_embedding
+            RETURN POW(TO_NUMBER(x), 2)
+    ))
+    FILTER norm > 0
+    UPDATE v WITH {
+        text_embedding: (FOR x in v.text_embedding RETURN TO_NUMBER(x) / norm), 
+        text_embedding_norm: norm, 
+        embedding_normalized: true
+    } IN @@collection
+"""
+
+'''
+STAC_EMBEDDINGS_QUERY:
+    Returns the ID, text embedding and spatial extent (list of bboxes) of all STAC collection nodes (used to build the in-memory vector and extent index)
+'''
+STAC_EMBEDDINGS_QUERY = """
+FOR v in STACCollection
+    RETURN {id: v._id, embedding: v.text_embedding, extent: v.extent.spatial.bbox}
+"""
+
+'''
+STAC_HYDRATION_QUERY:
+    scored_ids: list of {id, score} dictionaries (already ranked)
+
+    Loads the STAC collection nodes for the given ID's (order is preserved)
+    + searches for connected EO objects, STAC source and keywords
+'''
+STAC_HYDRATION_QUERY = """
+FOR node in @scored_ids
+    LET stac = DOCUMENT(node.id)
+    FILTER stac != null
+    LET conn_eo_objects = (
+        FOR v in OUTBOUND stac._id Mentions
+        RETURN {node: v}
+    )
+    LET stac_source = (
+        FOR v in INBOUND stac._id STACSourceContains
+        RETURN {name: v.name, link: v.href}
+    )
+    
+    LET keywords = (
+        FOR v in OUTBOUND stac._id HasKeyword 
+            RETURN {keyword: v}
+    )
+    
+    RETURN {stac:stac, score:node.score, eo_objects:conn_eo_objects, stac_source:stac_source, keywords:keywords}
+"""
+
 '''
 SIMPLE_PUB_EMB_QUERY:
-    query_embedding: list of floats (embedding) from SentenceTransformer model
+    query_embedding: list of floats (unit-normalized embedding) from SentenceTransformer model
     limit: maximum number of documents to return
 
     Returns Publication nodes that are similar to the query; uses text embedding vector similarity for search (semantic search)
     Note: low performance; too many Publication nodes to compute vector similarity in ArangoDB query!
+    -> semantic publication search uses the approximate nearest neighbour index (IVFIndex) in DataRetriever instead
 '''
 SIMPLE_PUB_EMB_QUERY = """
     LET query_emb = @query_embedding
 
-    LET query_emb_size = (SQRT(SUM(
-        FOR k IN RANGE(0,768)
-            RETURN POW(TO_NUMBER(NTH(query_emb, k)), 2)
-    )))
-
     FOR v in Publication
-        LET v_size = (SQRT(SUM(
-            FOR k IN RANGE(0,768)
-                RETURN POW(TO_NUMBER(NTH(v.text_embedding, k)), 2)
-        )))
-
-        LET numerator = (SUM(
-            FOR i in RANGE(0,768)
-                RETURN TO_NUMBER(NTH(query_emb, i)) * TO_NUMBER(NTH(v.text_embedding, i))
+        LET cos_sim = (SUM(
+            FOR i in RANGE(0, LENGTH(query_emb)-1)
+                RETURN query_emb[i] * TO_NUMBER(v.text_embedding[i])
         ))
 
-        LET cos_sim = (numerator)/(query_emb_size*v_size)
-
         SORT cos_sim DESC
         LIMIT @limit
         RETURN {pub: v, score:cos_sim}
 """
 
 
+'''
+PUB_EMBEDDINGS_QUERY:
+    Returns the ID and text embedding of all Publication nodes (used to build the approximate nearest neighbour index)
+'''
+PUB_EMBEDDINGS_QUERY = """
+FOR v in Publication
+    FILTER v.text_embedding != null
+    RETURN {id: v._id, embedding: v.text_embedding}
+"""
+
+'''
+PUB_HYDRATION_QUERY:
+    scored_ids: list of {id, score} dictionaries (already ranked)
+
+    Loads the Publication nodes for the given ID's (order is preserved)
+    + searches for connected EO objects, authors and keywords
+'''
+PUB_HYDRATION_QUERY = """
+FOR node in @scored_ids
+    LET pub = DOCUMENT(node.id)
+    FILTER pub != null
+    LET conn_eo_objects = (
+        FOR v in OUTBOUND pub._id Mentions
+            RETURN {node: v}
+    )
+    
+    LET authors = (
+        FOR v in INBOUND pub._id HasAuthor
+            RETURN {author: v}
+    )
+    
+    LET keywords = (
+        FOR v in OUTBOUND pub._id HasKeyword 
+            RETURN {keyword: v}
+    )
+
+    RETURN {pub:pub, score:node.score, eo_objects:conn_eo_objects, authors:authors, keywords:keywords}
+"""
+
+
 '''
 REFINED_EMB_QUERY
-    query_embedding: list of floats (embedding) from SentenceTransformer model
+    query_embedding: list of floats (unit-normalized embedding) from SentenceTransformer model
     node_id_list: list of ID's to use for search
     sim_threshold: threshold for the similarity score
     limit: maximum number of documents to return
@@ -260,25 +408,13 @@ REFINED_EMB_QUERY
 REFINED_EMB_QUERY = """
     LET query_emb = @query_embedding
 
-    LET query_emb_size = (SQRT(SUM(
-        FOR k IN RANGE(0,768)
-            RETURN POW(TO_NUMBER(NTH(query_emb, k)), 2)
-    )))
-
-    FOR id in node_id_list
+    FOR id in @node_id_list
         LET v = DOCUMENT(id)
-        LET v_size = (SQRT(SUM(
-            FOR k IN RANGE(0,768)
-                RETURN POW(TO_NUMBER(NTH(v.text_embedding, k)), 2)
-        )))
-
-        LET numerator = (SUM(
-            FOR i in RANGE(0,768)
-                RETURN TO_NUMBER(NTH(query_emb, i)) * TO_NUMBER(NTH(v.text_embedding, i))
+        LET cos_sim = (SUM(
+            FOR i in RANGE(0, LENGTH(query_emb)-1)
+                RETURN query_emb[i] * TO_NUMBER(v.text_embedding[i])
         ))
-
-        LET cos_sim = (numerator)/(query_emb_size*v_size)
-        FILTER cos_sim >= sim_threshold
+        FILTER cos_sim >= @sim_threshold
         SORT cos_sim DESC
         LIMIT @limit
         RETURN {node: v, score:cos_sim}
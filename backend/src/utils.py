@@ -1,3 +1,5 @@
+import zipfile
+
 # HELPER FUNCTIONS
 
 
@@ -21,5 +23,37 @@ def get_stac_collection_from_id(id_str:str):
         #print(f"WARNING: {e}")
         #print(f"returning id_str as is: {id_str}")
         return id_str
+
+
+class ZipStreamBuffer:
+    # write-only (unseekable) file object for zipfile; collects the written bytes until they are popped
+    def __init__(self) -> None:
+        self.chunks = []
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_zip(files):
+    '''
+        Generator that builds a zip archive on the fly from an iterable of (filename, content) tuples
+        Yields the bytes of every file as soon as it is compressed (no temporary file, archive is never fully kept in memory)
+    '''
+    buffer = ZipStreamBuffer()
+    with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_DEFLATED) as zip_file:
+        for filename, content in files:
+            zip_file.writestr(filename, content)
+            yield buffer.pop()
+    # central directory
+    yield buffer.pop()
     
     
\ No newline at end of file